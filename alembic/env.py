@@ -2,7 +2,6 @@ import os
 import sys
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config, pool
 from alembic import context
 
 # --- プロジェクト直下を import パスに入れる ---
@@ -21,9 +20,13 @@ if config.config_file_name is not None:
 
 # モデル読み込み（これで全テーブルが metadata に乗る）
 from app.db.models import Base  # noqa: E402
+from app.db.session import get_migration_engine  # noqa: E402
 
 target_metadata = Base.metadata
 
+# 型比較は全カラムの型を突き合わせるので重い。CI など必要な時だけ ALEMBIC_COMPARE_TYPE=1 で有効化
+COMPARE_TYPE = os.getenv("ALEMBIC_COMPARE_TYPE", "0") == "1"
+
 
 def get_url() -> str:
     return os.getenv("DATABASE_URL", "sqlite:///./app.db")
@@ -35,7 +38,7 @@ def run_migrations_offline() -> None:
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
-        compare_type=True,
+        compare_type=COMPARE_TYPE,
         dialect_opts={"paramstyle": "named"},
     )
     with context.begin_transaction():
@@ -43,21 +46,17 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
-    configuration = config.get_section(config.config_ini_section) or {}
-    configuration["sqlalchemy.url"] = get_url()
-
-    connectable = engine_from_config(
-        configuration,
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-        future=True,
-    )
+    # engine は URL ごとにプロセス内でキャッシュ（SQLite は NullPool / それ以外は QueuePool）
+    connectable = get_migration_engine(get_url())
 
+    # 1本の connection を migration 全体で使い回す（SQLAlchemy 2.0 の一括リフレクションが効く）
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
-            compare_type=True,
+            compare_type=COMPARE_TYPE,
+            include_schemas=False,
+            render_as_batch=False,
         )
         with context.begin_transaction():
             context.run_migrations()
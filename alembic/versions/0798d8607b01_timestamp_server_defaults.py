@@ -0,0 +1,46 @@
+"""timestamp server defaults
+
+Revision ID: 0798d8607b01
+Revises: 4fcf316f765f
+Create Date: 2026-10-15 21:57:33.145901
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0798d8607b01'
+down_revision: Union[str, None] = '4fcf316f765f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_TIMESTAMP_COLUMNS = {
+    'ai_runs': ['created_at', 'updated_at', 'started_at'],
+    'patent_retrievals': ['created_at', 'updated_at'],
+    'matrix_matches': ['created_at', 'updated_at'],
+    'match_evidences': ['created_at', 'updated_at'],
+    'patents': ['created_at', 'updated_at', 'ingested_at'],
+    'patent_usecases': ['created_at', 'updated_at'],
+    'matrix_rules': ['created_at', 'updated_at'],
+    'transactions': ['created_at', 'updated_at'],
+    'transaction_items': ['created_at', 'updated_at'],
+    'usage_requirements': ['created_at', 'updated_at'],
+}
+
+
+def upgrade() -> None:
+    for table, columns in _TIMESTAMP_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for col in columns:
+                batch_op.alter_column(col, existing_type=sa.DateTime(), existing_nullable=False, server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    for table, columns in _TIMESTAMP_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for col in columns:
+                batch_op.alter_column(col, existing_type=sa.DateTime(), existing_nullable=False, server_default=None)
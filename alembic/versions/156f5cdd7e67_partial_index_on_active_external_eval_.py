@@ -0,0 +1,41 @@
+"""partial index on active external_eval_requests
+
+Revision ID: 156f5cdd7e67
+Revises: da742c380292
+Create Date: 2026-10-15 21:59:35.350055
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '156f5cdd7e67'
+down_revision: Union[str, None] = 'da742c380292'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_ACTIVE = "status IN ('queued','running')"
+
+
+def upgrade() -> None:
+    # external_eval_requests は create_all で作られるので、無い DB では何もしない
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table('external_eval_requests'):
+        return
+    existing = {ix['name'] for ix in insp.get_indexes('external_eval_requests')}
+    if 'ix_external_eval_requests_status' in existing:
+        op.drop_index('ix_external_eval_requests_status', table_name='external_eval_requests')
+    op.create_index('ix_eer_active_status', 'external_eval_requests', ['status', 'created_at'], unique=False,
+                    postgresql_where=sa.text(_ACTIVE), sqlite_where=sa.text(_ACTIVE))
+
+
+def downgrade() -> None:
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table('external_eval_requests'):
+        return
+    op.drop_index('ix_eer_active_status', table_name='external_eval_requests')
+    op.create_index('ix_external_eval_requests_status', 'external_eval_requests', ['status'], unique=False)
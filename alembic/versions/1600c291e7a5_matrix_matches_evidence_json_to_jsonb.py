@@ -0,0 +1,45 @@
+"""matrix_matches evidence_json to jsonb
+
+Revision ID: 1600c291e7a5
+Revises: 2c5ca279e039
+Create Date: 2026-10-15 21:56:21.230316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '1600c291e7a5'
+down_revision: Union[str, None] = '2c5ca279e039'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    cols = {c["name"] for c in sa.inspect(bind).get_columns('matrix_matches')}
+    if 'evidence_json' not in cols:
+        # create_all 以外で作った DB には列が無いことがある
+        op.add_column('matrix_matches', sa.Column('evidence_json', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True))
+    elif bind.dialect.name == 'postgresql':
+        op.alter_column(
+            'matrix_matches',
+            'evidence_json',
+            existing_type=sa.Text(),
+            type_=postgresql.JSONB(),
+            postgresql_using='evidence_json::jsonb',
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column(
+            'matrix_matches',
+            'evidence_json',
+            existing_type=postgresql.JSONB(),
+            type_=sa.Text(),
+            postgresql_using='evidence_json::text',
+        )
@@ -0,0 +1,28 @@
+"""add ai_runs status indexes
+
+Revision ID: 2c5ca279e039
+Revises: 16734207caef
+Create Date: 2026-10-15 21:56:03.121766
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c5ca279e039'
+down_revision: Union[str, None] = '16734207caef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_ai_runs_status_started', 'ai_runs', ['status', 'started_at'], unique=False)
+    op.create_index('ix_ai_runs_type_status', 'ai_runs', ['run_type', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_runs_type_status', table_name='ai_runs')
+    op.drop_index('ix_ai_runs_status_started', table_name='ai_runs')
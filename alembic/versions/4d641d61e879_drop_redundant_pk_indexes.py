@@ -0,0 +1,45 @@
+"""drop redundant pk indexes
+
+Revision ID: 4d641d61e879
+Revises: 0798d8607b01
+Create Date: 2026-10-15 21:58:32.986953
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d641d61e879'
+down_revision: Union[str, None] = '0798d8607b01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# create_all で作った DB にだけ存在する（PK の一意インデックスと重複）
+_PK_INDEXES = {
+    'ix_external_eval_requests_id': 'external_eval_requests',
+    'ix_matrix_matches_id': 'matrix_matches',
+    'ix_usage_requirements_id': 'usage_requirements',
+    'ix_matrix_rules_id': 'matrix_rules',
+}
+
+
+def _existing_indexes(table: str) -> set:
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table(table):
+        return set()
+    return {ix['name'] for ix in insp.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table in _PK_INDEXES.items():
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    # 重複インデックスなので戻さない
+    pass
@@ -0,0 +1,76 @@
+"""match_evidences typed source fks
+
+Revision ID: 4fcf316f765f
+Revises: 1600c291e7a5
+Create Date: 2026-10-15 21:56:55.208875
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4fcf316f765f'
+down_revision: Union[str, None] = '1600c291e7a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_ONE_SOURCE = (
+    "(CASE WHEN usage_requirement_id IS NOT NULL THEN 1 ELSE 0 END)"
+    " + (CASE WHEN patent_usecase_id IS NOT NULL THEN 1 ELSE 0 END)"
+    " + (CASE WHEN transaction_id IS NOT NULL THEN 1 ELSE 0 END) = 1"
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('match_evidences') as batch_op:
+        batch_op.add_column(sa.Column('usage_requirement_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('patent_usecase_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('transaction_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_match_evidences_usage_requirement_id', 'usage_requirements', ['usage_requirement_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('fk_match_evidences_patent_usecase_id', 'patent_usecases', ['patent_usecase_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('fk_match_evidences_transaction_id', 'transactions', ['transaction_id'], ['id'], ondelete='CASCADE')
+
+    # evidence_type + source_id -> 種類別 FK
+    op.execute("UPDATE match_evidences SET usage_requirement_id = source_id WHERE evidence_type = 'usage_requirement'")
+    op.execute("UPDATE match_evidences SET patent_usecase_id = source_id WHERE evidence_type = 'patent_usecase'")
+    op.execute("UPDATE match_evidences SET transaction_id = source_id WHERE evidence_type = 'transaction'")
+
+    with op.batch_alter_table('match_evidences') as batch_op:
+        batch_op.drop_column('source_id')
+        batch_op.create_check_constraint('ck_evidence_one_source', _ONE_SOURCE)
+
+    op.create_index('ix_me_uri', 'match_evidences', ['usage_requirement_id'], unique=False,
+                    postgresql_where=sa.text('usage_requirement_id IS NOT NULL'),
+                    sqlite_where=sa.text('usage_requirement_id IS NOT NULL'))
+    op.create_index('ix_me_puc', 'match_evidences', ['patent_usecase_id'], unique=False,
+                    postgresql_where=sa.text('patent_usecase_id IS NOT NULL'),
+                    sqlite_where=sa.text('patent_usecase_id IS NOT NULL'))
+    op.create_index('ix_me_tx', 'match_evidences', ['transaction_id'], unique=False,
+                    postgresql_where=sa.text('transaction_id IS NOT NULL'),
+                    sqlite_where=sa.text('transaction_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_me_tx', table_name='match_evidences')
+    op.drop_index('ix_me_puc', table_name='match_evidences')
+    op.drop_index('ix_me_uri', table_name='match_evidences')
+
+    with op.batch_alter_table('match_evidences') as batch_op:
+        batch_op.drop_constraint('ck_evidence_one_source', type_='check')
+        batch_op.add_column(sa.Column('source_id', sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE match_evidences SET source_id = COALESCE(usage_requirement_id, patent_usecase_id, transaction_id)"
+    )
+
+    with op.batch_alter_table('match_evidences') as batch_op:
+        batch_op.drop_constraint('fk_match_evidences_transaction_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_match_evidences_patent_usecase_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_match_evidences_usage_requirement_id', type_='foreignkey')
+        batch_op.drop_column('transaction_id')
+        batch_op.drop_column('patent_usecase_id')
+        batch_op.drop_column('usage_requirement_id')
@@ -0,0 +1,76 @@
+"""matrix lookup indexes
+
+Revision ID: 5e1ecdc03f5f
+Revises: e575070680af
+Create Date: 2026-10-15 22:15:07.119700
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1ecdc03f5f'
+down_revision: Union[str, None] = 'e575070680af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# ingest の (regime, item_no, version) 引きは uq_matrix_rules_regime_itemno_version の一意インデックスで引ける。
+# 以下はその先頭列 / ix_matrix_matches_run_rule の先頭列と重複する単独インデックス
+_REDUNDANT_INDEXES = {
+    'ix_matrix_rules_regime_itemno': 'matrix_rules',
+    'ix_matrix_rules_regime': 'matrix_rules',
+    'ix_matrix_matches_ai_run_id': 'matrix_matches',
+}
+
+
+def _existing_indexes(table: str) -> set:
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table(table):
+        return set()
+    names = {ix['name'] for ix in insp.get_indexes(table)}
+    names |= {uq['name'] for uq in insp.get_unique_constraints(table) if uq.get('name')}
+    return names
+
+
+def upgrade() -> None:
+    existing = _existing_indexes('matrix_rules')
+    # create_all で作った DB には一意制約が無いので、同じ列の通常インデックスで補う
+    if existing and 'uq_matrix_rules_regime_itemno_version' not in existing \
+            and 'ix_matrix_rules_regime_itemno_ver' not in existing:
+        op.create_index(
+            'ix_matrix_rules_regime_itemno_ver', 'matrix_rules', ['regime', 'item_no', 'version'], unique=False
+        )
+
+    for name, table in _REDUNDANT_INDEXES.items():
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
+
+
+# 単独インデックスの定義（downgrade で戻す用）
+_INDEX_COLUMNS = {
+    'ix_matrix_rules_regime_itemno': ['regime', 'item_no'],
+    'ix_matrix_rules_regime': ['regime'],
+    'ix_matrix_matches_ai_run_id': ['ai_run_id'],
+}
+
+
+def downgrade() -> None:
+    # upgrade で何を消したかは DB の出どころで決まる（upgrade と同じく inspector で見て戻す）
+    # - create_all で作った DB: ix_matrix_rules_regime_itemno_ver がある。
+    #   消したのは regime / ai_run_id の単独インデックス（index=True 由来）
+    # - migration で作った DB: 52d938928ab7 の ix_matrix_rules_regime_itemno / ix_matrix_matches_ai_run_id
+    if 'ix_matrix_rules_regime_itemno_ver' in _existing_indexes('matrix_rules'):
+        restore = ('ix_matrix_rules_regime', 'ix_matrix_matches_ai_run_id')
+        op.drop_index('ix_matrix_rules_regime_itemno_ver', table_name='matrix_rules')
+    else:
+        restore = ('ix_matrix_rules_regime_itemno', 'ix_matrix_matches_ai_run_id')
+
+    for name in restore:
+        table = _REDUNDANT_INDEXES[name]
+        existing = _existing_indexes(table)
+        if existing and name not in existing:
+            op.create_index(name, table, _INDEX_COLUMNS[name], unique=False)
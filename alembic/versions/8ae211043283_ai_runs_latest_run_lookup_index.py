@@ -0,0 +1,31 @@
+"""ai_runs latest-run lookup index
+
+Revision ID: 8ae211043283
+Revises: a54395be3550
+Create Date: 2026-10-15 22:04:38.082956
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8ae211043283'
+down_revision: Union[str, None] = 'a54395be3550'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_ai_runs_tx_type_status_id',
+        'ai_runs',
+        ['transaction_id', 'run_type', 'status', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_runs_tx_type_status_id', table_name='ai_runs')
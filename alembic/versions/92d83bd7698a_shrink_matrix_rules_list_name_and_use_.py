@@ -0,0 +1,43 @@
+"""shrink matrix_rules list_name and use text for urls
+
+Revision ID: 92d83bd7698a
+Revises: 156f5cdd7e67
+Create Date: 2026-10-15 22:00:05.872420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '92d83bd7698a'
+down_revision: Union[str, None] = '156f5cdd7e67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite は VARCHAR 長を強制しないので型変更は不要
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    op.alter_column('matrix_rules', 'list_name', existing_type=sa.String(length=255), type_=sa.String(length=128),
+                    existing_nullable=True)
+    op.alter_column('patents', 'source_url', existing_type=sa.String(length=1024), type_=sa.Text(),
+                    existing_nullable=True)
+    if sa.inspect(op.get_bind()).has_table('external_eval_requests'):
+        op.alter_column('external_eval_requests', 'callback_webhook', existing_type=sa.String(length=1024),
+                        type_=sa.Text(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    if sa.inspect(op.get_bind()).has_table('external_eval_requests'):
+        op.alter_column('external_eval_requests', 'callback_webhook', existing_type=sa.Text(),
+                        type_=sa.String(length=1024), existing_nullable=False)
+    op.alter_column('patents', 'source_url', existing_type=sa.Text(), type_=sa.String(length=1024),
+                    existing_nullable=True)
+    op.alter_column('matrix_rules', 'list_name', existing_type=sa.String(length=128), type_=sa.String(length=255),
+                    existing_nullable=True)
@@ -0,0 +1,50 @@
+"""promote matrix_matches rule fields to columns
+
+Revision ID: a54395be3550
+Revises: f29c4a794c3f
+Create Date: 2026-10-15 22:03:50.662706
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a54395be3550'
+down_revision: Union[str, None] = 'f29c4a794c3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('matrix_matches', sa.Column('rule_item_no', sa.String(length=300), nullable=True))
+    op.add_column('matrix_matches', sa.Column('rule_title', sa.String(length=200), nullable=True))
+    op.add_column('matrix_matches', sa.Column('rule_snippet', sa.Text(), nullable=True))
+
+    # 既存行は evidence_json から埋める
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "update matrix_matches set "
+            "rule_item_no = evidence_json->>'rule_item_no', "
+            "rule_title = evidence_json->>'rule_title', "
+            "rule_snippet = evidence_json->>'rule_snippet' "
+            "where evidence_json is not null"
+        )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "update matrix_matches set "
+            "rule_item_no = json_extract(evidence_json, '$.rule_item_no'), "
+            "rule_title = json_extract(evidence_json, '$.rule_title'), "
+            "rule_snippet = json_extract(evidence_json, '$.rule_snippet') "
+            "where evidence_json is not null and json_valid(evidence_json)"
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('matrix_matches') as batch_op:
+        batch_op.drop_column('rule_snippet')
+        batch_op.drop_column('rule_title')
+        batch_op.drop_column('rule_item_no')
@@ -0,0 +1,37 @@
+"""params and attachments_meta to jsonb
+
+Revision ID: da742c380292
+Revises: 4d641d61e879
+Create Date: 2026-10-15 21:58:53.337465
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'da742c380292'
+down_revision: Union[str, None] = '4d641d61e879'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite 等は JSON のまま（型は TEXT 相当で変化なし）
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('ai_runs', 'params', existing_type=sa.JSON(), type_=postgresql.JSONB(),
+                    existing_nullable=False, postgresql_using='params::jsonb')
+    op.alter_column('transaction_items', 'attachments_meta', existing_type=sa.JSON(), type_=postgresql.JSONB(),
+                    existing_nullable=False, postgresql_using='attachments_meta::jsonb')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('transaction_items', 'attachments_meta', existing_type=postgresql.JSONB(), type_=sa.JSON(),
+                    existing_nullable=False, postgresql_using='attachments_meta::json')
+    op.alter_column('ai_runs', 'params', existing_type=postgresql.JSONB(), type_=sa.JSON(),
+                    existing_nullable=False, postgresql_using='params::json')
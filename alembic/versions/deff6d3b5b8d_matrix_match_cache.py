@@ -0,0 +1,34 @@
+"""matrix match cache
+
+Revision ID: deff6d3b5b8d
+Revises: 5e1ecdc03f5f
+Create Date: 2026-10-15 22:18:21.866764
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'deff6d3b5b8d'
+down_revision: Union[str, None] = '5e1ecdc03f5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('matrix_match_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('source_run_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['source_run_id'], ['ai_runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_matrix_match_cache_source_run_id'), 'matrix_match_cache', ['source_run_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_matrix_match_cache_source_run_id'), table_name='matrix_match_cache')
+    op.drop_table('matrix_match_cache')
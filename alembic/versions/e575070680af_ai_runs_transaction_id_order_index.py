@@ -0,0 +1,30 @@
+"""ai_runs transaction id order index
+
+Revision ID: e575070680af
+Revises: 8ae211043283
+Create Date: 2026-10-15 22:07:06.987994
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e575070680af'
+down_revision: Union[str, None] = '8ae211043283'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_ai_runs_tx_id_desc', 'ai_runs', ['transaction_id', 'id'], unique=False)
+
+    # 上の複合インデックスの先頭列と重複する単独インデックス
+    op.drop_index(op.f('ix_ai_runs_transaction_id'), table_name='ai_runs')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_ai_runs_transaction_id'), 'ai_runs', ['transaction_id'], unique=False)
+    op.drop_index('ix_ai_runs_tx_id_desc', table_name='ai_runs')
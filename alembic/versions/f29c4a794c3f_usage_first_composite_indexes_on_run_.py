@@ -0,0 +1,39 @@
+"""usage-first composite indexes on run graph
+
+Revision ID: f29c4a794c3f
+Revises: 92d83bd7698a
+Create Date: 2026-10-15 22:00:46.315383
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f29c4a794c3f'
+down_revision: Union[str, None] = '92d83bd7698a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_mm_ur_run', 'matrix_matches', ['usage_requirement_id', 'ai_run_id'], unique=False)
+    op.create_index('ix_pr_ur_run', 'patent_retrievals', ['usage_requirement_id', 'ai_run_id'], unique=False)
+    op.create_index('ix_me_match_type', 'match_evidences', ['matrix_match_id', 'evidence_type'], unique=False)
+
+    # 上の複合インデックスの先頭列と重複する単独インデックス
+    op.drop_index(op.f('ix_matrix_matches_usage_requirement_id'), table_name='matrix_matches')
+    op.drop_index(op.f('ix_patent_retrievals_usage_requirement_id'), table_name='patent_retrievals')
+    op.drop_index(op.f('ix_match_evidences_matrix_match_id'), table_name='match_evidences')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_match_evidences_matrix_match_id'), 'match_evidences', ['matrix_match_id'], unique=False)
+    op.create_index(op.f('ix_patent_retrievals_usage_requirement_id'), 'patent_retrievals', ['usage_requirement_id'], unique=False)
+    op.create_index(op.f('ix_matrix_matches_usage_requirement_id'), 'matrix_matches', ['usage_requirement_id'], unique=False)
+
+    op.drop_index('ix_me_match_type', table_name='match_evidences')
+    op.drop_index('ix_pr_ur_run', table_name='patent_retrievals')
+    op.drop_index('ix_mm_ur_run', table_name='matrix_matches')
@@ -0,0 +1,18 @@
+# app/bootstrap.py
+"""
+プロセス起動時の環境変数（torch / tokenizers / HuggingFace）。
+これらはライブラリの import 時に読まれるので、app.main の先頭で import する。
+既に設定されている値は上書きしない。
+"""
+import os
+
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("NUMEXPR_NUM_THREADS", "1")
+
+# HuggingFace のキャッシュを固定（並列DL/競合を減らす）
+if "HF_HOME" not in os.environ or "TRANSFORMERS_CACHE" not in os.environ:
+    _hf_cache = os.path.join(os.getcwd(), ".hf_cache")
+    os.environ.setdefault("HF_HOME", _hf_cache)
+    os.environ.setdefault("TRANSFORMERS_CACHE", _hf_cache)
@@ -1,4 +1,15 @@
-from sqlalchemy.orm import DeclarativeBase
+from datetime import datetime
+
+from sqlalchemy import DateTime, func
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
 
 class Base(DeclarativeBase):
     pass
+
+
+class TimestampMixin:
+    # 時刻は DB 側で埋める（行ごとの Python datetime 生成をやめ、複数行 INSERT をまとめられるようにする）
+    # onupdate は SQLite でもトリガ無しで動くよう SQL 式として UPDATE 文に載せる
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -0,0 +1,49 @@
+# app/db/bulk.py
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.models.ai_run import MatchEvidence, MatrixMatch, PatentRetrieval
+
+
+def bulk_insert_evidence(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    MatchEvidence を複数行 INSERT 1 回で入れる（ORM の add() を行ごとに積まない）。
+    rows は業務カラムだけの dict（created_at / updated_at は server_default に任せる）。
+    Postgres では ON CONFLICT DO NOTHING にして、同じ行の再投入（バックフィル）を冪等にする。
+    """
+    if not rows:
+        return 0
+
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = pg_insert(MatchEvidence).on_conflict_do_nothing()
+    else:
+        stmt = insert(MatchEvidence)
+
+    db.execute(stmt, rows)
+    return len(rows)
+
+
+def bulk_insert_matrix_matches(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    MatrixMatch を executemany 1 回で入れる（id は使わないので RETURNING しない）。
+    rows は全行同じキー構成にすること（created_at / updated_at は server_default）。
+    """
+    if not rows:
+        return 0
+
+    db.execute(insert(MatrixMatch), rows)
+    return len(rows)
+
+
+def bulk_insert_patent_retrievals(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """PatentRetrieval を executemany 1 回で入れる（id は使わないので RETURNING しない）"""
+    if not rows:
+        return 0
+
+    db.execute(insert(PatentRetrieval), rows)
+    return len(rows)
@@ -1,5 +1,5 @@
 from typing import Generator
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, get_db_ro  # noqa: F401
 
 def get_db() -> Generator:
     db = SessionLocal()
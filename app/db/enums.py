@@ -0,0 +1,60 @@
+# app/db/enums.py
+# モデル・サービス共通の列挙値。ここで 1 回だけ定義して各所から import する
+from __future__ import annotations
+
+import enum
+
+
+class _StrEnum(str, enum.Enum):
+    # テンプレート / f-string でそのまま値が出るようにする（"RunStatus.success" にしない）
+    def __str__(self) -> str:
+        return self.value
+
+
+class RunStatus(_StrEnum):
+    success = "success"
+    failed = "failed"
+    running = "running"
+
+
+class RunType(_StrEnum):
+    usage_extract = "usage_extract"
+    patent_retrieve = "patent_retrieve"
+    usage_expand = "usage_expand"
+    matrix_match = "matrix_match"
+    explanation = "explanation"
+
+
+class MatchType(_StrEnum):
+    core_hit = "core_hit"
+    expanded_hit = "expanded_hit"
+
+
+class MatchDecision(_StrEnum):
+    hit = "hit"
+    maybe = "maybe"
+
+
+class EvidenceType(_StrEnum):
+    usage_requirement = "usage_requirement"
+    patent_usecase = "patent_usecase"
+    transaction = "transaction"
+
+
+class TransactionStatus(_StrEnum):
+    draft = "draft"
+    in_review = "in_review"
+    approved = "approved"
+    rejected = "rejected"
+
+
+class UsageSource(_StrEnum):
+    core = "core"
+    expanded = "expanded"
+    analyst_added = "analyst_added"
+
+
+class CreatedBy(_StrEnum):
+    user = "user"
+    ai = "ai"
+    ui = "ui"  # 外部連携（UI Product → AI）で作られた usage
@@ -0,0 +1,27 @@
+# app/db/loading.py
+from __future__ import annotations
+
+import os
+from typing import Any, TypeVar
+
+from sqlalchemy.orm import lazyload, raiseload
+
+# 1: 指定していない relationship に触れたら例外（N+1 を開発中に即検出）
+# 0: raiseload の代わりに lazyload("*")（本番で想定外の lazy load が起きても落とさない。
+#    モデル既定の selectin も止めるので、dev と同じく指定した relationship しか先読みしない）
+# 既定は APP_ENV=prod のときだけ 0、それ以外（dev / CI）は 1
+_DEFAULT_STRICT = "0" if os.getenv("APP_ENV") == "prod" else "1"
+STRICT_LOADING = os.getenv("DB_STRICT_LOADING", _DEFAULT_STRICT) != "0"
+
+T = TypeVar("T")
+
+
+def strict(stmt: T, *loads: Any) -> T:
+    """
+    一覧系クエリ用。必要な relationship だけ明示的に eager load し、
+    それ以外は raiseload("*") で暗黙の lazy load（N+1）を禁止する。
+    select() / Query のどちらにも使える。
+    """
+    if STRICT_LOADING:
+        return stmt.options(*loads, raiseload("*"))  # type: ignore[attr-defined]
+    return stmt.options(*loads, lazyload("*"))  # type: ignore[attr-defined]
@@ -1,5 +1,17 @@
 # app/db/models/__init__.py
-from app.db.models.ai_run import AiRun, RunType, RunStatus, MatrixMatch
-from app.db.models.transaction import Transaction, UsageRequirement
-from app.db.models.patent import Patent
+# 各モデルクラスはここで 1 回だけ import する（Base.metadata に全テーブルが乗る）
+from app.db.base import Base, TimestampMixin
+from app.db.models.ai_run import AiRun, RunType, RunStatus, PatentRetrieval, MatrixMatch, MatrixMatchCache, MatchEvidence
+from app.db.models.transaction import Transaction, TransactionItem, UsageRequirement
+from app.db.models.patent import Patent, PatentUsecase
 from app.db.models.matrix import MatrixRule
+from app.db.models.integration import ExternalEvalRequest
+
+# 同名クラスの二重定義（mapper の二重登録）は import 時点で検出する
+_mapped_names = [m.class_.__name__ for m in Base.registry.mappers]
+assert len(_mapped_names) == len(set(_mapped_names)), f"duplicate mapped classes: {sorted(_mapped_names)}"
+
+# mapper / relationship 設定を import 時に確定させる（初回クエリで待たない・設定ミスを起動時に検出）
+from sqlalchemy.orm import configure_mappers  # noqa: E402
+
+configure_mappers()
@@ -1,56 +1,51 @@
 # app/db/models/ai_run.py
 from __future__ import annotations
 
-import enum
 from datetime import datetime
 from typing import Optional, List, Dict, Any, TYPE_CHECKING
 
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index, Float
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index, Float, CheckConstraint, Enum, text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
-from app.db.base import Base
+from app.db.base import Base, TimestampMixin
+from app.db.enums import RunStatus, RunType
 
 if TYPE_CHECKING:
     from app.db.models.transaction import Transaction, UsageRequirement
-    from app.db.models.patent import Patent
+    from app.db.models.patent import Patent, PatentUsecase
     from app.db.models.matrix import MatrixRule
 
 
-class RunStatus(str, enum.Enum):
-    success = "success"
-    failed = "failed"
-    running = "running"
-
-
-class RunType(str, enum.Enum):
-    usage_extract = "usage_extract"
-    patent_retrieve = "patent_retrieve"
-    usage_expand = "usage_expand"
-    matrix_match = "matrix_match"
-    explanation = "explanation"
-
-
-class TimestampMixin:
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+def _enum_values(e: type) -> List[str]:
+    return [m.value for m in e]
 
 
 class AiRun(Base, TimestampMixin):
     __tablename__ = "ai_runs"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    transaction_id: Mapped[int] = mapped_column(ForeignKey("transactions.id", ondelete="CASCADE"), index=True)
+    # 単独 index は ix_ai_runs_tx_id_desc（先頭列）でカバー
+    transaction_id: Mapped[int] = mapped_column(ForeignKey("transactions.id", ondelete="CASCADE"))
 
-    run_type: Mapped[str] = mapped_column(String(32), nullable=False)
-    status: Mapped[str] = mapped_column(String(16), default=RunStatus.running.value, nullable=False)
+    # VARCHAR のまま（native_enum=False）。値は RunType / RunStatus の value を保存する
+    run_type: Mapped[RunType] = mapped_column(
+        Enum(RunType, native_enum=False, length=32, values_callable=_enum_values),
+        nullable=False,
+    )
+    status: Mapped[RunStatus] = mapped_column(
+        Enum(RunStatus, native_enum=False, length=16, values_callable=_enum_values),
+        default=RunStatus.running,
+        nullable=False,
+    )
 
     model_name: Mapped[Optional[str]] = mapped_column(String(128))
     prompt_version: Mapped[Optional[str]] = mapped_column(String(64))
 
-    params: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict, nullable=False)
+    params: Mapped[Dict[str, Any]] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), default=dict, nullable=False)
 
-    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
     finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     error: Mapped[Optional[str]] = mapped_column(Text)
 
@@ -67,6 +62,16 @@ class AiRun(Base, TimestampMixin):
         passive_deletes=True,
     )
 
+    __table_args__ = (
+        # WHERE status = :s ORDER BY started_at DESC（ダッシュボード系）
+        Index("ix_ai_runs_status_started", "status", "started_at"),
+        Index("ix_ai_runs_type_status", "run_type", "status"),
+        # 取引ごとの run_type 別・最新 success（max(id)）を index だけで引く
+        Index("ix_ai_runs_tx_type_status_id", "transaction_id", "run_type", "status", "id"),
+        # 詳細画面の WHERE transaction_id = :t ORDER BY id DESC LIMIT 50（逆順スキャンで sort 不要）
+        Index("ix_ai_runs_tx_id_desc", "transaction_id", "id"),
+    )
+
 
 class PatentRetrieval(Base, TimestampMixin):
     __tablename__ = "patent_retrievals"
@@ -74,7 +79,7 @@ class PatentRetrieval(Base, TimestampMixin):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     ai_run_id: Mapped[int] = mapped_column(ForeignKey("ai_runs.id", ondelete="CASCADE"), index=True)
 
-    usage_requirement_id: Mapped[int] = mapped_column(ForeignKey("usage_requirements.id", ondelete="CASCADE"), index=True)
+    usage_requirement_id: Mapped[int] = mapped_column(ForeignKey("usage_requirements.id", ondelete="CASCADE"))
     patent_id: Mapped[int] = mapped_column(ForeignKey("patents.id", ondelete="CASCADE"), index=True)
 
     score: Mapped[float] = mapped_column(Float, nullable=False)
@@ -82,9 +87,13 @@ class PatentRetrieval(Base, TimestampMixin):
 
     ai_run: Mapped["AiRun"] = relationship(back_populates="patent_retrievals")
     usage_requirement: Mapped["UsageRequirement"] = relationship(back_populates="patent_retrievals")
-    patent: Mapped["Patent"] = relationship(back_populates="retrievals")
+    patent: Mapped["Patent"] = relationship(back_populates="retrievals", lazy="joined")
 
-    __table_args__ = (Index("ix_patent_retrievals_run_usage", "ai_run_id", "usage_requirement_id"),)
+    __table_args__ = (
+        Index("ix_patent_retrievals_run_usage", "ai_run_id", "usage_requirement_id"),
+        # usage 起点（usage_requirement_id 単独の検索もこれでカバー）
+        Index("ix_pr_ur_run", "usage_requirement_id", "ai_run_id"),
+    )
 
 
 class MatrixMatch(Base):
@@ -93,13 +102,13 @@ class MatrixMatch(Base):
     """
     __tablename__ = "matrix_matches"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
-    ai_run_id: Mapped[int] = mapped_column(ForeignKey("ai_runs.id", ondelete="CASCADE"), index=True)
+    # ai_run_id 単独の検索（run 単位の delete / 一覧）は ix_matrix_matches_run_rule の先頭列で引く
+    ai_run_id: Mapped[int] = mapped_column(ForeignKey("ai_runs.id", ondelete="CASCADE"))
     matrix_rule_id: Mapped[int] = mapped_column(ForeignKey("matrix_rules.id", ondelete="CASCADE"), index=True)
     usage_requirement_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("usage_requirements.id", ondelete="CASCADE"),
-        index=True,
         nullable=True,
     )
 
@@ -109,19 +118,106 @@ class MatrixMatch(Base):
     # DB側が NOT NULL のため必須
     decision: Mapped[str] = mapped_column(String(16), nullable=False, default="hit")
 
-    evidence_json: Mapped[Optional[str]] = mapped_column(Text)
+    # Postgres では JSONB（サーバ側でパース済み / キー単位で参照可）、SQLite 等では JSON
+    # 一覧では使わないので遅延ロード（必要なクエリで undefer_group("details")）
+    evidence_json: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        JSON().with_variant(JSONB(), "postgresql"),
+        deferred=True,
+        deferred_group="details",
+    )
+
+    # 判定・webhook で毎回読む項目は evidence_json から列に昇格（JSON パース不要）
+    rule_item_no: Mapped[Optional[str]] = mapped_column(String(300), nullable=True)
+    rule_title: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
+    rule_snippet: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # ★ここが今回の本丸：DB側に updated_at NOT NULL があるならモデルにも持たせて必ず埋める
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime,
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        server_default=func.now(),
+        onupdate=func.now(),
         nullable=False,
     )
 
     ai_run: Mapped["AiRun"] = relationship(back_populates="matrix_matches")
     usage_requirement: Mapped["UsageRequirement"] = relationship(back_populates="matrix_matches")
     matrix_rule: Mapped["MatrixRule"] = relationship(back_populates="matches")
+    evidences: Mapped[List["MatchEvidence"]] = relationship(
+        back_populates="matrix_match",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        Index("ix_matrix_matches_run_rule", "ai_run_id", "matrix_rule_id"),
+        # usage 起点（usage_requirement_id 単独の検索もこれでカバー）
+        Index("ix_mm_ur_run", "usage_requirement_id", "ai_run_id"),
+    )
+
 
-    __table_args__ = (Index("ix_matrix_matches_run_rule", "ai_run_id", "matrix_rule_id"),)
\ No newline at end of file
+class MatrixMatchCache(Base):
+    """
+    matrix_match の入力（usage / rule 内容・threshold・top_k）のハッシュ → 結果を持つ run。
+    同じ入力での再実行は、スコア計算をせず source_run の matrix_matches をコピーする。
+    source_run が消えたらキャッシュ行も消える（CASCADE）。
+    """
+    __tablename__ = "matrix_match_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)  # blake2b hexdigest（32 byte）
+    source_run_id: Mapped[int] = mapped_column(ForeignKey("ai_runs.id", ondelete="CASCADE"), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+class MatchEvidence(Base, TimestampMixin):
+    """
+    matrix_match の根拠。参照先は種類ごとの FK で持ち、どれか 1 つだけ埋める
+    （evidence_type + source_id の自由参照はやめた）。
+    """
+    __tablename__ = "match_evidences"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    matrix_match_id: Mapped[int] = mapped_column(ForeignKey("matrix_matches.id", ondelete="CASCADE"))
+
+    evidence_type: Mapped[str] = mapped_column(String(32), nullable=False)  # usage_requirement / patent_usecase / transaction
+
+    usage_requirement_id: Mapped[Optional[int]] = mapped_column(ForeignKey("usage_requirements.id", ondelete="CASCADE"))
+    patent_usecase_id: Mapped[Optional[int]] = mapped_column(ForeignKey("patent_usecases.id", ondelete="CASCADE"))
+    transaction_id: Mapped[Optional[int]] = mapped_column(ForeignKey("transactions.id", ondelete="CASCADE"))
+
+    quote: Mapped[Optional[str]] = mapped_column(Text)
+    explanation: Mapped[Optional[str]] = mapped_column(Text)
+
+    matrix_match: Mapped["MatrixMatch"] = relationship(back_populates="evidences")
+    usage_requirement: Mapped[Optional["UsageRequirement"]] = relationship()
+    patent_usecase: Mapped[Optional["PatentUsecase"]] = relationship()
+    transaction: Mapped[Optional["Transaction"]] = relationship()
+
+    __table_args__ = (
+        CheckConstraint(
+            "(CASE WHEN usage_requirement_id IS NOT NULL THEN 1 ELSE 0 END)"
+            " + (CASE WHEN patent_usecase_id IS NOT NULL THEN 1 ELSE 0 END)"
+            " + (CASE WHEN transaction_id IS NOT NULL THEN 1 ELSE 0 END) = 1",
+            name="ck_evidence_one_source",
+        ),
+        # matrix_match → evidences の selectin ロード用（matrix_match_id 単独の検索もこれでカバー）
+        Index("ix_me_match_type", "matrix_match_id", "evidence_type"),
+        Index(
+            "ix_me_uri",
+            "usage_requirement_id",
+            postgresql_where=text("usage_requirement_id IS NOT NULL"),
+            sqlite_where=text("usage_requirement_id IS NOT NULL"),
+        ),
+        Index(
+            "ix_me_puc",
+            "patent_usecase_id",
+            postgresql_where=text("patent_usecase_id IS NOT NULL"),
+            sqlite_where=text("patent_usecase_id IS NOT NULL"),
+        ),
+        Index(
+            "ix_me_tx",
+            "transaction_id",
+            postgresql_where=text("transaction_id IS NOT NULL"),
+            sqlite_where=text("transaction_id IS NOT NULL"),
+        ),
+    )
\ No newline at end of file
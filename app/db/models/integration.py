@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import uuid
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, func, text
 from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
 
 from app.db.base import Base  # ← あなたのプロジェクトでBaseのimport先が違う場合は修正
@@ -14,7 +14,7 @@ class ExternalEvalRequest(Base):
     """
     __tablename__ = "external_eval_requests"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
 
     # UI側の Product.id
     product_id = Column(Integer, nullable=False, index=True)
@@ -22,7 +22,7 @@ class ExternalEvalRequest(Base):
     # AI側が発行する request_id（UIへ返す / 監査ログ用）
     request_id = Column(String(64), nullable=False, unique=True, index=True, default=lambda: f"ecreq_{uuid.uuid4().hex}")
 
-    callback_webhook = Column(String(1024), nullable=False)
+    callback_webhook = Column(Text, nullable=False)  # URL は索引しないので Text
 
     # UIから受け取った生payload（JSON文字列）
     payload_in = Column(Text, nullable=False)
@@ -30,7 +30,7 @@ class ExternalEvalRequest(Base):
     # AI側で作った transaction を追えるとデバッグが楽
     transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True, index=True)
 
-    status = Column(String(32), nullable=False, default="queued", index=True)  # queued/running/completed/error
+    status = Column(String(32), nullable=False, default="queued")  # queued/running/completed/error
     reason = Column(Text, nullable=True)
 
     # UIへ返す生payload（JSON文字列）
@@ -38,3 +38,14 @@ class ExternalEvalRequest(Base):
 
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    # 未処理（queued/running）の行だけを索引する部分インデックス。completed/error は増え続けるので載せない
+    __table_args__ = (
+        Index(
+            "ix_eer_active_status",
+            "status",
+            "created_at",
+            postgresql_where=text("status IN ('queued','running')"),
+            sqlite_where=text("status IN ('queued','running')"),
+        ),
+    )
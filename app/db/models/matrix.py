@@ -1,10 +1,8 @@
 # app/db/models/matrix.py
 from __future__ import annotations
 
-from datetime import datetime
-
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, func
+from sqlalchemy.orm import relationship, deferred
 
 from app.db.base import Base
 
@@ -12,22 +10,29 @@ from app.db.base import Base
 class MatrixRule(Base):
     __tablename__ = "matrix_rules"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
 
-    regime = Column(String(32), nullable=False, index=True)          # 例: JP_FX
-    list_name = Column(String(255), nullable=True, index=True)       # 例: "3項 化学兵器"
+    regime = Column(String(32), nullable=False)                      # 例: JP_FX（検索は下の一意制約の先頭列で引く）
+    list_name = Column(String(128), nullable=True, index=True)       # 例: "3項 化学兵器"（シート名由来で短い）
+    # 輸出令/貨物等省令の参照を連結した文字列（import 時は title[:160] の fallback もある）ので 64 には詰めない
     item_no = Column(String(255), nullable=False, index=True)        # 例: "輸出令 第3項..."
     title = Column(Text, nullable=True)
-    requirement_text = Column(Text, nullable=False)                 # NOT NULL
-    usage_criteria_text = Column(Text, nullable=True)
-    tech_criteria_text = Column(Text, nullable=True)
-    notes = Column(Text, nullable=True)
+    # 本文系は大きいので遅延ロード（必要なクエリで undefer_group("details")）
+    requirement_text = deferred(Column(Text, nullable=False), group="details")  # NOT NULL
+    usage_criteria_text = deferred(Column(Text, nullable=True), group="details")
+    tech_criteria_text = deferred(Column(Text, nullable=True), group="details")
+    notes = deferred(Column(Text, nullable=True), group="details")
 
     version = Column(String(64), nullable=True)
     effective_date = Column(String(32), nullable=True)
 
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # matrix_matches は ai_run.py 側の MatrixMatch.matrix_rule と対応
     matches = relationship("MatrixMatch", back_populates="matrix_rule")
+
+    __table_args__ = (
+        # ingest の (regime, item_no[, version]) 引き・regime 単独の絞り込みもこの一意インデックスで引く
+        UniqueConstraint("regime", "item_no", "version", name="uq_matrix_rules_regime_itemno_version"),
+    )
@@ -1,28 +1,22 @@
 """
-Transaction model
+Patent model
 """
 from __future__ import annotations
 
-import enum
 from datetime import datetime
 from typing import Optional, List, Dict, Any, TYPE_CHECKING
 
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index, Float
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index, Float, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import JSON
 
-from app.db.base import Base
+from app.db.base import Base, TimestampMixin
 
 
 if TYPE_CHECKING:
     from app.db.models.ai_run import PatentRetrieval
 
 
-class TimestampMixin:
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-
-
 class Patent(Base, TimestampMixin):
     __tablename__ = "patents"
 
@@ -31,17 +25,19 @@ class Patent(Base, TimestampMixin):
     publication_number: Mapped[str] = mapped_column(String(128), unique=True, index=True, nullable=False)
     title: Mapped[Optional[str]] = mapped_column(String(512))
     assignee: Mapped[Optional[str]] = mapped_column(String(512))
-    abstract: Mapped[Optional[str]] = mapped_column(Text)
-    fulltext: Mapped[Optional[str]] = mapped_column(Text)
+    # 本文系は大きいので遅延ロード（必要なクエリで undefer_group("details")）
+    abstract: Mapped[Optional[str]] = mapped_column(Text, deferred=True, deferred_group="details")
+    fulltext: Mapped[Optional[str]] = mapped_column(Text, deferred=True, deferred_group="details")
 
     ipc_codes_raw: Mapped[Optional[str]] = mapped_column(Text)
-    source_url: Mapped[Optional[str]] = mapped_column(String(1024))
-    ingested_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    source_url: Mapped[Optional[str]] = mapped_column(Text)  # URL は索引しないので Text
+    ingested_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
 
     usecases: Mapped[List["PatentUsecase"]] = relationship(
         back_populates="patent",
         cascade="all, delete-orphan",
         passive_deletes=True,
+        lazy="selectin",
     )
     retrievals: Mapped[List["PatentRetrieval"]] = relationship(
         back_populates="patent",
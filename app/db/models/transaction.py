@@ -3,44 +3,22 @@ Transaction model
 """
 from __future__ import annotations
 
-import enum
 from datetime import datetime
 from typing import Optional, List, Dict, Any, TYPE_CHECKING
 
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index, Float
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Index, Float, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.types import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
-from app.db.base import Base
+from app.db.base import Base, TimestampMixin
+from app.db.enums import TransactionStatus, UsageSource, CreatedBy
 
 
 if TYPE_CHECKING:
     from app.db.models.ai_run import AiRun, PatentRetrieval, MatrixMatch
 
 
-class TransactionStatus(str, enum.Enum):
-    draft = "draft"
-    in_review = "in_review"
-    approved = "approved"
-    rejected = "rejected"
-
-
-class UsageSource(str, enum.Enum):
-    core = "core"
-    expanded = "expanded"
-    analyst_added = "analyst_added"
-
-
-class CreatedBy(str, enum.Enum):
-    user = "user"
-    ai = "ai"
-
-
-class TimestampMixin:
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-
-
 class Transaction(Base, TimestampMixin):
     __tablename__ = "transactions"
 
@@ -51,15 +29,18 @@ class Transaction(Base, TimestampMixin):
 
     created_by_user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
+    # items / usage_requirements は取引ごとに数件で、画面・集計でほぼ必ず辿るので selectin でまとめて引く
     items: Mapped[List["TransactionItem"]] = relationship(
         back_populates="transaction",
         cascade="all, delete-orphan",
         passive_deletes=True,
+        lazy="selectin",
     )
     usage_requirements: Mapped[List["UsageRequirement"]] = relationship(
         back_populates="transaction",
         cascade="all, delete-orphan",
         passive_deletes=True,
+        lazy="selectin",
     )
     ai_runs: Mapped[List["AiRun"]] = relationship(
         back_populates="transaction",
@@ -78,7 +59,7 @@ class TransactionItem(Base, TimestampMixin):
     item_model: Mapped[Optional[str]] = mapped_column(String(255))
     spec_text: Mapped[Optional[str]] = mapped_column(Text)
 
-    attachments_meta: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict, nullable=False)
+    attachments_meta: Mapped[Dict[str, Any]] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), default=dict, nullable=False)
 
     transaction: Mapped["Transaction"] = relationship(back_populates="items")
 
@@ -97,7 +78,7 @@ class UsageRequirement(Base):
     """
     __tablename__ = "usage_requirements"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
     transaction_id: Mapped[int] = mapped_column(
         ForeignKey("transactions.id", ondelete="CASCADE"),
@@ -124,10 +105,10 @@ class UsageRequirement(Base):
 
     # ★今回のエラー原因：DB NOT NULL なのにモデル未定義だった
     created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.utcnow, nullable=False
+        DateTime, server_default=func.now(), nullable=False
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+        DateTime, server_default=func.now(), onupdate=func.now(), nullable=False
     )
 
     transaction: Mapped["Transaction"] = relationship(back_populates="usage_requirements")
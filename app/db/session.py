@@ -1,9 +1,21 @@
+import atexit
+import itertools
+import json
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Iterator, Optional
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import create_engine, event, pool
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import scoped_session, sessionmaker, Session
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 # =========================
 # Database configuration
@@ -13,21 +25,138 @@ BASE_DIR = Path(__file__).resolve().parents[2]  # .../AI_validation
 DEFAULT_DB = BASE_DIR / "app.db"
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DEFAULT_DB}")
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") in ("sqlite:", "sqlite:/"))
+
+connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+
+# Postgres/MySQL 等は FastAPI の同時リクエスト数に合わせて pool を確保し、古い接続は張り直す
+# SQLite は SQLAlchemy 既定の pool のまま
+pool_kwargs = {} if IS_SQLITE else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": 30,
+    "pool_recycle": 3600,
+}
+
+# JSON / JSONB 列（evidence_json, params, risk_tags 等）のシリアライズ
+# - 日本語は \uXXXX にせず UTF-8 のまま書く（SQLite ではそのまま保存サイズになる）
+# - orjson があればそちらを使う（Rust 実装で dumps / loads とも速い）
+def _json_serializer(v) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(v, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson が扱えない値（64bit を超える int 等）は標準 json に任せる
+            pass
+    return json.dumps(v, ensure_ascii=False)
+
+
+_json_deserializer = orjson.loads if orjson is not None else json.loads
 
 engine = create_engine(
     DATABASE_URL,
     echo=False,
     future=True,
     connect_args=connect_args,
+    pool_pre_ping=True,
+    # select() の compiled cache（既定 500 では UI + pipeline の文が溢れる）
+    query_cache_size=int(os.getenv("DB_QUERY_CACHE_SIZE", "1200")),
+    json_serializer=_json_serializer,
+    json_deserializer=_json_deserializer,
+    **pool_kwargs,
+)
+
+# SQLite チューニング（UI の読み取りと background の書き込みが同時に走るため）
+# - WAL: 書き込み中も読み取りがブロックされない
+# - synchronous=NORMAL: WAL なら commit ごとの fsync を省いても壊れない
+# - busy_timeout: ロック競合時は即エラーにせず待つ（background の pipeline と webhook 処理が重なる）
+# - foreign_keys: ondelete=CASCADE / SET NULL と passive_deletes は FK 有効が前提
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '10000'))}",
+    "PRAGMA foreign_keys=ON",
 )
 
+if IS_SQLITE and not IS_SQLITE_MEMORY:
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        cur = dbapi_connection.cursor()
+        try:
+            for pragma in _SQLITE_PRAGMAS:
+                cur.execute(pragma)
+        finally:
+            cur.close()
+
 SessionLocal = sessionmaker(
     bind=engine,
     autocommit=False,
     autoflush=False,
 )
 
+
+def batch_session() -> Session:
+    """
+    scripts/ の import / seed 用の Session。
+    書き込んで commit するだけで commit 後に ORM 属性を読み直さないので、expire_on_commit を切る
+    （autoflush は SessionLocal 側で無効）
+    """
+    return SessionLocal(expire_on_commit=False)
+
+
+# 読み取り専用エンドポイント用：1 リクエスト内で Session を使い回す
+# スコープは thread-local ではなくリクエスト単位の ContextVar
+# （sync エンドポイントは threadpool で動くので、thread-local だと後片付けできない）
+_request_scope: ContextVar[Optional[int]] = ContextVar("db_request_scope", default=None)
+_scope_ids = itertools.count(1)
+
+ScopedSession = scoped_session(SessionLocal, scopefunc=_request_scope.get)
+
+
+@contextmanager
+def db_request_scope() -> Iterator[None]:
+    """
+    HTTP middleware から 1 リクエストを囲む。抜けるときに ScopedSession.remove() する
+    """
+    token = _request_scope.set(next(_scope_ids))
+    try:
+        yield
+    finally:
+        ScopedSession.remove()
+        _request_scope.reset(token)
+
+
+# =========================
+# Alembic 用 engine（URL ごとに 1 回だけ作る）
+# =========================
+
+@lru_cache(maxsize=4)
+def get_migration_engine(url: str) -> Engine:
+    """
+    alembic/env.py は コマンド実行のたびに読み直されるため、engine のキャッシュはこちらで持つ。
+    テスト等で Alembic をプロセス内から何度も呼ぶ場合に dialect / pool の初期化を省ける。
+    """
+    if url.startswith("sqlite"):
+        # SQLite はファイルロックの都合で NullPool のまま
+        eng = create_engine(url, poolclass=pool.NullPool, future=True)
+    else:
+        # NAT/FW のアイドル切断で「失敗→再接続」にならないよう、事前 ping と定期的な張り直し
+        eng = create_engine(
+            url,
+            poolclass=pool.QueuePool,
+            pool_size=5,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+            future=True,
+        )
+    atexit.register(eng.dispose)
+    return eng
+
 # =========================
 # FastAPI dependency
 # =========================
@@ -42,3 +171,11 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_db_ro() -> Generator[Session, None, None]:
+    """
+    FastAPI dependency（読み取り専用の GET 用）。
+    ScopedSession を返し、close はせず db_request_scope の終了時にまとめて remove する。
+    """
+    yield ScopedSession()
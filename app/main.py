@@ -1,16 +1,9 @@
-# app/main.py の先頭（他の import より前に置く）
-import os
-
-os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
-os.environ.setdefault("OMP_NUM_THREADS", "1")
-os.environ.setdefault("MKL_NUM_THREADS", "1")
-os.environ.setdefault("NUMEXPR_NUM_THREADS", "1")
+# app/main.py
+from app import bootstrap as _bootstrap  # noqa: F401  # 他の import より前に置く（torch / tokenizers の env）
 
-# HuggingFace のキャッシュを固定（並列DL/競合を減らす）
-os.environ.setdefault("HF_HOME", os.path.join(os.getcwd(), ".hf_cache"))
-os.environ.setdefault("TRANSFORMERS_CACHE", os.path.join(os.getcwd(), ".hf_cache"))
+import os
+from contextlib import asynccontextmanager
 
-# app/main.py
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates
@@ -18,18 +11,28 @@ from starlette.templating import Jinja2Templates
 from app.routers.decision import router as decision_router
 from app.routers.ui import router as ui_router
 from app.routers.integration_export_control import router as integration_router
+from app.services.integrations.export_control import close_webhook_client
 
-from app.db.session import engine
+from app.db.session import db_request_scope, engine
 from app.db.base import Base
 
 # create_all が拾うようにモデルを import
 # （integration.py の場所はあなたの現状に合わせてOK）
 from app.db.models import integration  # noqa: F401
 
-# テーブル作成（PoC向け：Alembic導入後は削除してOK）
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="AI Validation (Trade Screening)", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # テーブル作成（PoC向け：Alembic導入後は削除してOK）
+    # import 時ではなく起動時に 1 回だけ。multi-worker 構成では DB_AUTO_CREATE=0 にして
+    # エントリポイント（alembic upgrade head 等）側で DDL を流す
+    if os.getenv("DB_AUTO_CREATE", "1") == "1":
+        Base.metadata.create_all(bind=engine)
+    yield
+    await close_webhook_client()
+
+
+app = FastAPI(title="AI Validation (Trade Screening)", version="0.1.0", lifespan=lifespan)
 
 # static
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -38,6 +41,13 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 app.state.templates = templates
 
+
+# get_db_ro（ScopedSession）をリクエスト終了時に片付ける
+@app.middleware("http")
+async def scoped_db_session(request, call_next):
+    with db_request_scope():
+        return await call_next(request)
+
 # routers
 app.include_router(ui_router)
 app.include_router(decision_router)
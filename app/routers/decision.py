@@ -1,23 +1,36 @@
-from typing import Optional, Dict, Any
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.orm import Session
 
-from app.db.deps import get_db
+try:
+    import orjson
+except ImportError:  # orjson は任意（無ければ標準 json）
+    orjson = None  # type: ignore[assignment]
+
+from app.db.deps import get_db, get_db_ro
 from app.services.two_list import compute_two_lists
 from app.services.pipeline.orchestrator import run_until_matrix_match
 
 router = APIRouter(prefix="/decision", tags=["decision"])
 
+# 2リストは入れ子の大きい dict なので、jsonable_encoder を通さず Response を直接返して 1 回で bytes にする
+# （中身は JSON 由来の値と str / float / int だけなので変換不要）
+_JSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
 
 @router.get("/{transaction_id}/two-lists")
 def get_two_lists(
     transaction_id: int,
     run_id: Optional[int] = Query(default=None, description="指定したrun_idのmatrix_matchesを使う。省略時は最新のmatrix_match runを使う"),
-    db: Session = Depends(get_db),
-) -> Dict[str, Any]:
+    full: bool = Query(default=False, description="true なら hit ごとの evidence（元 JSON）も返す"),
+    db: Session = Depends(get_db_ro),
+) -> JSONResponse:
     try:
-        return compute_two_lists(db=db, transaction_id=transaction_id, run_id=run_id)
+        return _JSONResponse(
+            compute_two_lists(db=db, transaction_id=transaction_id, run_id=run_id, include_evidence=full)
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -28,8 +41,9 @@ def get_two_lists(
 def run_and_two_lists(
     transaction_id: int,
     threshold: float = Query(default=0.75, description="matrix_match の閾値（暫定）"),
+    full: bool = Query(default=False, description="true なら hit ごとの evidence（元 JSON）も返す"),
     db: Session = Depends(get_db),
-) -> Dict[str, Any]:
+) -> JSONResponse:
     """
     ① pipeline を matrix_match まで実行
     ② 2リスト集計を返す（intersection / expanded_only）
@@ -39,13 +53,15 @@ def run_and_two_lists(
         run_until_matrix_match(db=db, transaction_id=transaction_id)
 
         # 省略時は最新runを拾う設計なので run_id は渡さない
-        result = compute_two_lists(db=db, transaction_id=transaction_id, run_id=None)
-        return {
-            "ok": True,
-            "transaction_id": transaction_id,
-            "threshold": threshold,
-            "two_lists": result,
-        }
+        result = compute_two_lists(db=db, transaction_id=transaction_id, run_id=None, include_evidence=full)
+        return _JSONResponse(
+            {
+                "ok": True,
+                "transaction_id": transaction_id,
+                "threshold": threshold,
+                "two_lists": result,
+            }
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
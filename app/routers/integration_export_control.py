@@ -1,11 +1,11 @@
 # app/routers/integration_export_control.py
 from __future__ import annotations
 
-import json
 from typing import Optional
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from pydantic import BaseModel, HttpUrl
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
@@ -40,18 +40,21 @@ def create_export_control_request(
     db: Session = Depends(get_db),
 ) -> ExportControlRequestOut:
     try:
-        payload_dict = body.model_dump(mode="json")  # HttpUrl等をJSON化
-        payload_in = json.dumps(payload_dict, ensure_ascii=False)
-
-        req = ExternalEvalRequest(
-            product_id=body.product_id,
-            status="queued",
-            callback_webhook=str(body.callback_webhook),
-            payload_in=payload_in,  # ★ここが重要（request_payload ではなく payload_in）
-        )
-        db.add(req)
+        # HttpUrl等をJSON化（pydantic-core 側で直接 JSON 文字列にする。dict 経由の json.dumps はしない）
+        payload_in = body.model_dump_json()
+
+        # INSERT ... RETURNING で id / status を 1 往復で受け取る（flush + refresh しない）
+        req = db.execute(
+            insert(ExternalEvalRequest)
+            .values(
+                product_id=body.product_id,
+                status="queued",
+                callback_webhook=str(body.callback_webhook),
+                payload_in=payload_in,  # ★ここが重要（request_payload ではなく payload_in）
+            )
+            .returning(ExternalEvalRequest.id, ExternalEvalRequest.status)
+        ).one()
         db.commit()
-        db.refresh(req)
 
     except Exception as e:
         db.rollback()
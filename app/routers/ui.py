@@ -4,12 +4,14 @@ from typing import Optional, Dict, Any
 from fastapi import APIRouter, Depends, Request, HTTPException, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 
-from app.db.deps import get_db
+from app.db.deps import get_db, get_db_ro
+from app.db.loading import strict
 
 from app.db.models.transaction import Transaction
-from app.db.models.ai_run import AiRun, RunType
+from app.db.enums import RunType
+from app.db.models.ai_run import AiRun
 from app.services.pipeline.orchestrator import run_until_matrix_match
 from app.services.two_list import compute_two_lists
 
@@ -23,12 +25,31 @@ def home(request: Request):
 
 
 @router.get("/ui/transactions", response_class=HTMLResponse)
-def transactions_page(request: Request, db: Session = Depends(get_db)):
-    txs = db.query(Transaction).order_by(desc(Transaction.id)).all()
+def transactions_page(
+    request: Request,
+    db: Session = Depends(get_db_ro),
+    page: int = Query(default=1, ge=1),
+    size: int = Query(default=100, ge=1, le=500),
+):
+    # 一覧テンプレートは tx のスカラー列しか使わないので、items / usage_requirements の selectin も止める
+    # 件数が増えても 1 画面分だけ読む（次ページ有無は size+1 件目で判定）
+    rows = db.scalars(
+        strict(select(Transaction))
+        .order_by(desc(Transaction.id))
+        .offset((page - 1) * size)
+        .limit(size + 1)
+    ).all()
+    txs = rows[:size]
     templates = request.app.state.templates
     return templates.TemplateResponse(
         "transactions.html",
-        {"request": request, "txs": txs},
+        {
+            "request": request,
+            "txs": txs,
+            "page": page,
+            "size": size,
+            "has_next": len(rows) > size,
+        },
     )
 
 
@@ -39,26 +60,26 @@ def transaction_detail_page(
     db: Session = Depends(get_db),
     run_id: Optional[int] = Query(default=None),
 ):
-    tx = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    # 詳細テンプレートも tx はスカラー列のみ（マッチ結果は compute_two_lists 側で集計する）
+    tx = db.execute(strict(select(Transaction)).where(Transaction.id == transaction_id)).scalar_one_or_none()
     if not tx:
         raise HTTPException(status_code=404, detail="transaction not found")
 
     # 最新run（UI表示用）
-    runs = (
-        db.query(AiRun)
-        .filter(AiRun.transaction_id == transaction_id)
+    runs = db.scalars(
+        strict(select(AiRun))
+        .where(AiRun.transaction_id == transaction_id)
         .order_by(desc(AiRun.id))
         .limit(50)
-        .all()
-    )
+    ).all()
 
     # 直近の matrix_match run_id（あれば）
-    latest_matrix_match = (
-        db.query(AiRun)
-        .filter(AiRun.transaction_id == transaction_id, AiRun.run_type == RunType.matrix_match.value)
+    latest_matrix_match = db.scalars(
+        strict(select(AiRun))
+        .where(AiRun.transaction_id == transaction_id, AiRun.run_type == RunType.matrix_match.value)
         .order_by(desc(AiRun.id))
-        .first()
-    )
+        .limit(1)
+    ).first()
 
     # 2リスト結果（任意：run_id指定があれば先に見せる）
     two_lists: Optional[Dict[str, Any]] = None
@@ -97,15 +118,15 @@ def run_pipeline_and_show(
     run_until_matrix_match(db=db, transaction_id=transaction_id, threshold=threshold)
 
     # 最新 matrix_match run を引いて、その run_id を付けて詳細へ戻す
-    latest = (
-        db.query(AiRun)
-        .filter(AiRun.transaction_id == transaction_id, AiRun.run_type == RunType.matrix_match.value)
+    latest_id = db.scalar(
+        select(AiRun.id)
+        .where(AiRun.transaction_id == transaction_id, AiRun.run_type == RunType.matrix_match.value)
         .order_by(desc(AiRun.id))
-        .first()
+        .limit(1)
     )
 
     url = f"/ui/transactions/{transaction_id}"
-    if latest:
-        url += f"?run_id={latest.id}"
+    if latest_id:
+        url += f"?run_id={latest_id}"
 
     return RedirectResponse(url=url, status_code=303)
@@ -1,14 +1,23 @@
 # app/services/integrations/export_control.py
 from __future__ import annotations
 
+import asyncio
 import json
-import time
+import os
+import random
+import re
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+
+try:
+    import orjson
+except ImportError:  # orjson は任意（無ければ標準 json）
+    orjson = None  # type: ignore[assignment]
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import bindparam, select, text
 
 from app.db.session import SessionLocal
 from app.db.models.integration import ExternalEvalRequest
@@ -36,13 +45,19 @@ def _json_loads_safe(v: Any, default: Any = None) -> Any:
         return v
     if isinstance(v, str):
         try:
-            return json.loads(v)
+            return orjson.loads(v) if orjson is not None else json.loads(v)
         except Exception:
             return default
     return default
 
 
 def _json_dumps_safe(v: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(v, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # 64bit を超える int 等、orjson が扱えない値は標準 json に任せる
+            pass
     return json.dumps(v, ensure_ascii=False, default=str)
 
 
@@ -93,33 +108,32 @@ def create_transaction_from_payload(db: Session, payload: Dict[str, Any]) -> int
     case_no = _make_case_no(product_id)
     title = f"External Request: {payload.get('code')} {payload.get('name')}"
 
-    tx = Transaction(case_no=case_no, title=title, status="draft")
-    db.add(tx)
-    db.flush()
+    usage_text = (payload.get("description") or "").strip()
+    if not usage_text:
+        usage_text = f"{payload.get('name')} / {payload.get('code')}"
 
+    # relationship の cascade で組み立て、flush は 1 回だけ（unit of work が INSERT 順を解決）
     item = TransactionItem(
-        transaction_id=tx.id,
         item_name=str(payload.get("name") or "Item"),
         item_model=str(payload.get("code") or ""),
         spec_text=_build_spec_text(payload),
         attachments_meta={"files": []},
     )
-    db.add(item)
-    db.flush()
-
-    usage_text = (payload.get("description") or "").strip()
-    if not usage_text:
-        usage_text = f"{payload.get('name')} / {payload.get('code')}"
-
     u = UsageRequirement(
-        transaction_id=tx.id,
-        transaction_item_id=item.id,
+        transaction_item=item,
         source="core",
         text=usage_text,
         risk_tags=[],  # NOT NULL 対策
         created_by="ui",
     )
-    db.add(u)
+    tx = Transaction(
+        case_no=case_no,
+        title=title,
+        status="draft",
+        items=[item],
+        usage_requirements=[u],
+    )
+    db.add(tx)
     db.flush()
 
     return tx.id
@@ -128,85 +142,115 @@ def create_transaction_from_payload(db: Session, payload: Dict[str, Any]) -> int
 # =============================================================================
 # DB fetch helpers (run_type別に最新を拾う / SQLAlchemy2 text()対応)
 # =============================================================================
-def _latest_ai_run_id(db: Session, transaction_id: int, run_type: str) -> Optional[int]:
+def _latest_ai_run_ids(db: Session, transaction_id: int, run_types: Tuple[str, ...]) -> Dict[str, int]:
     """
-    ai_runs: transaction_id + run_type の最新 id を返す
+    ai_runs: transaction_id の run_type 別・最新 success の id を 1 クエリで返す
+    （run_type ごとに max(id) を引き直さない）
     """
     try:
-        row = db.execute(
+        rows = db.execute(
             text(
                 """
-                select max(id) as id
+                select run_type, max(id) as id
                 from ai_runs
                 where transaction_id = :txid
-                  and run_type = :rtype
                   and status = 'success'
+                  and run_type in :rtypes
+                group by run_type
                 """
-            ),
-            {"txid": transaction_id, "rtype": run_type},
-        ).fetchone()
-        if row and row[0]:
-            return int(row[0])
+            ).bindparams(bindparam("rtypes", expanding=True)),
+            {"txid": transaction_id, "rtypes": list(run_types)},
+        ).fetchall()
     except Exception:
-        return None
-    return None
+        return {}
+    return {str(rt): int(rid) for rt, rid in rows if rid}
 
 
-def _fetch_patent_retrievals(db: Session, ai_run_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+def _fetch_run_results(
+    db: Session,
+    pat_run_id: Optional[int],
+    mat_run_id: Optional[int],
+    limit: int = 50,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
-    patent_retrievals schema: usage_requirement_id, patent_id, score, why, ai_run_id ...
-    """
-    rows = db.execute(
-        text(
-            """
-            select usage_requirement_id, patent_id, score, why
-            from patent_retrievals
-            where ai_run_id = :rid
-            order by usage_requirement_id, score desc
-            limit :lim
-            """
-        ),
-        {"rid": ai_run_id, "lim": limit},
-    ).fetchall()
-    return [dict(r._mapping) for r in rows]
+    patent_retrievals / matrix_matches の上位を UNION ALL で 1 往復にまとめて引く。
 
-
-def _fetch_matrix_matches(db: Session, ai_run_id: int, limit: int = 50) -> List[Dict[str, Any]]:
-    """
+    patent_retrievals schema: usage_requirement_id, patent_id, score, why, ai_run_id ...
     matrix_matches schema（あなたの現状）:
-      usage_requirement_id, matrix_rule_id, match_score, match_type, decision, evidence_json, ai_run_id ...
+      usage_requirement_id, matrix_rule_id, match_score, match_type, decision,
+      rule_item_no, rule_title, rule_snippet, evidence_json, ai_run_id ...
+    判定に使う rule_* は列から直接読む（evidence は payload 用にだけ展開）
     """
+    if not pat_run_id and not mat_run_id:
+        return [], []
+
     rows = db.execute(
         text(
             """
-            select usage_requirement_id,
-                   matrix_rule_id,
-                   match_score,
-                   match_type,
-                   decision,
-                   evidence_json
-            from matrix_matches
-            where ai_run_id = :rid
-            order by match_score desc
-            limit :lim
+            select * from (
+                select 'pat' as kind,
+                       row_number() over (order by usage_requirement_id, score desc) as rn,
+                       usage_requirement_id,
+                       patent_id as ref_id,
+                       score,
+                       why as c1,
+                       null as c2,
+                       null as c3,
+                       null as c4,
+                       null as c5,
+                       null as ev
+                from patent_retrievals
+                where ai_run_id = :pid
+                order by usage_requirement_id, score desc
+                limit :lim
+            ) as p
+            union all
+            select * from (
+                select 'mat' as kind,
+                       row_number() over (order by match_score desc) as rn,
+                       usage_requirement_id,
+                       matrix_rule_id,
+                       match_score,
+                       match_type,
+                       decision,
+                       rule_item_no,
+                       rule_title,
+                       rule_snippet,
+                       evidence_json
+                from matrix_matches
+                where ai_run_id = :mid
+                order by match_score desc
+                limit :lim
+            ) as m
+            order by kind desc, rn
             """
         ),
-        {"rid": ai_run_id, "lim": limit},
+        {"pid": pat_run_id, "mid": mat_run_id, "lim": limit},
     ).fetchall()
 
-    out: List[Dict[str, Any]] = []
-    for r in rows:
-        d = dict(r._mapping)
-        ev_raw = d.get("evidence_json")
+    pats: List[Dict[str, Any]] = []
+    mats: List[Dict[str, Any]] = []
+    for (kind, _rn, ur_id, ref_id, score, c1, c2, c3, c4, c5, ev_raw) in rows:
+        if kind == "pat":
+            pats.append({"usage_requirement_id": ur_id, "patent_id": ref_id, "score": score, "why": c1})
+            continue
         ev = _json_loads_safe(ev_raw, default=None)
-        # evidence_json が壊れていたり dict でない場合は None に寄せる
-        d["evidence"] = ev if isinstance(ev, dict) else None
-        # 互換のため evidence_json は削る（payloadが巨大化しがちなので）
-        # 必要なら UI側で raw も見たいので残す場合はコメントアウト解除
-        # d["evidence_json"] = ev_raw
-        d.pop("evidence_json", None)
-        out.append(d)
-    return out
+        mats.append(
+            {
+                "usage_requirement_id": ur_id,
+                "matrix_rule_id": ref_id,
+                "match_score": score,
+                "match_type": c1,
+                "decision": c2,
+                "rule_item_no": c3,
+                "rule_title": c4,
+                "rule_snippet": c5,
+                # evidence_json が壊れていたり dict でない場合は None に寄せる
+                # 互換のため evidence_json（raw）は返さない（payloadが巨大化しがちなので）
+                "evidence": ev if isinstance(ev, dict) else None,
+            }
+        )
+    return pats, mats
 
 
 # =============================================================================
@@ -223,8 +267,12 @@ def _summarize_result_payload(db: Session, transaction_id: int) -> Dict[str, Any
         "_debug": {"generated_at": _utc_ts()},
     }
 
-    # transaction / items / usages
-    tx = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    # transaction / items / usages（items / usages は selectin で 1 往復ずつまとめて引く）
+    tx = db.execute(
+        select(Transaction)
+        .options(selectinload(Transaction.items), selectinload(Transaction.usage_requirements))
+        .where(Transaction.id == transaction_id)
+    ).scalar_one_or_none()
     if tx:
         payload["transaction"] = {
             "id": tx.id,
@@ -233,13 +281,13 @@ def _summarize_result_payload(db: Session, transaction_id: int) -> Dict[str, Any
             "status": getattr(tx, "status", None),
         }
 
-    items = db.query(TransactionItem).filter(TransactionItem.transaction_id == transaction_id).all()
+    items: List[TransactionItem] = list(tx.items) if tx else []
     payload["items"] = [
         {"id": it.id, "item_name": getattr(it, "item_name", None), "item_model": getattr(it, "item_model", None)}
         for it in items
     ]
 
-    usages = db.query(UsageRequirement).filter(UsageRequirement.transaction_id == transaction_id).all()
+    usages: List[UsageRequirement] = list(tx.usage_requirements) if tx else []
     payload["usages"] = [
         {
             "id": ur.id,
@@ -252,18 +300,25 @@ def _summarize_result_payload(db: Session, transaction_id: int) -> Dict[str, Any
     ]
 
     # latest ai_run ids
-    rid_pat = _latest_ai_run_id(db, transaction_id, "patent_retrieve")
-    rid_mat = _latest_ai_run_id(db, transaction_id, "matrix_match")
+    # success run の有無はこの GROUP BY 自体で分かるので、別途 exists は投げない。
+    # 0 件なら _fetch_run_results は DB に行かずに空を返す。transaction が無ければ run も無い
+    latest = _latest_ai_run_ids(db, transaction_id, ("patent_retrieve", "matrix_match")) if tx else {}
+    rid_pat = latest.get("patent_retrieve")
+    rid_mat = latest.get("matrix_match")
     payload["_debug"]["latest_patent_ai_run_id"] = rid_pat
     payload["_debug"]["latest_matrix_ai_run_id"] = rid_mat
 
     # results
-    payload["patent_retrievals_top"] = _fetch_patent_retrievals(db, rid_pat, limit=50) if rid_pat else []
-    payload["matrix_matches_top"] = _fetch_matrix_matches(db, rid_mat, limit=50) if rid_mat else []
+    payload["patent_retrievals_top"], payload["matrix_matches_top"] = _fetch_run_results(db, rid_pat, rid_mat, limit=50)
 
     return payload
 
 
+# followup の振り分けキーワード（小文字化した blob に対して 1 パスで判定）
+_PHOTO_RE = re.compile("|".join(map(re.escape, ["フォト", "リソ", "resist", "litho", "露光", "現像", "感光"])))
+_CRYPTO_RE = re.compile("|".join(map(re.escape, ["暗号", "crypto", "encryption"])))
+
+
 def _pick_followup_questions(top_evidence: Optional[Dict[str, Any]]) -> List[str]:
     """
     top rule の雰囲気に応じて質問を返す（最小実装）。
@@ -276,12 +331,13 @@ def _pick_followup_questions(top_evidence: Optional[Dict[str, Any]]) -> List[str
             "輸出先国・需要者（民生/研究/軍関連）情報はありますか？（キャッチオール観点）",
         ]
 
-    title = (top_evidence.get("rule_title") or "").lower()
-    item_no = (top_evidence.get("rule_item_no") or "").lower()
-    snippet = (top_evidence.get("rule_snippet") or "").lower()
+    title = top_evidence.get("rule_title") or ""
+    item_no = top_evidence.get("rule_item_no") or ""
+    snippet = top_evidence.get("rule_snippet") or ""
+    blob = f"{title} {snippet} {item_no}".lower()
 
     # photolithography / resist 系
-    if any(k in title + snippet + item_no for k in ["フォト", "リソ", "resist", "litho", "露光", "現像", "感光"]):
+    if _PHOTO_RE.search(blob):
         return [
             "対象工程はどれですか？（塗布/露光/PEB/現像/洗浄/剥離）",
             "露光波長は確定していますか？（KrF 248nm / ArF 193nm / i-line 等）",
@@ -291,7 +347,7 @@ def _pick_followup_questions(top_evidence: Optional[Dict[str, Any]]) -> List[str
         ]
 
     # crypto / control device 系（例）
-    if any(k in title + snippet + item_no for k in ["暗号", "crypto", "encryption"]):
+    if _CRYPTO_RE.search(blob):
         return [
             "暗号機能の有無と仕様（鍵長、アルゴリズム、実装形態）を教えてください。",
             "暗号機能はユーザーが有効化できますか？それとも固定ですか？",
@@ -325,10 +381,13 @@ def _decide_status_reason(payload_out: Dict[str, Any], threshold: float) -> Tupl
     top = mm[0]
     top_score = float(top.get("match_score") or 0.0)
     top_decision = str(top.get("decision") or "").lower()
-    top_ev = top.get("evidence") if isinstance(top.get("evidence"), dict) else None
+    # rule_* は列から読む（列追加前の旧データだけ evidence にフォールバック）
+    legacy_ev = top.get("evidence") if isinstance(top.get("evidence"), dict) else {}
+    rule_info = {k: top.get(k) or legacy_ev.get(k) for k in ("rule_item_no", "rule_title", "rule_snippet")}
+    top_ev = rule_info if any(rule_info.values()) else None
 
-    top_rule = (top_ev or {}).get("rule_item_no") or str(top.get("matrix_rule_id"))
-    top_title = (top_ev or {}).get("rule_title") or "(no title)"
+    top_rule = rule_info["rule_item_no"] or str(top.get("matrix_rule_id"))
+    top_title = rule_info["rule_title"] or "(no title)"
 
     # controlled/non_controlled が明示され、score も閾値を超えるなら確定
     if top_decision in {"controlled", "non_controlled"} and top_score >= threshold:
@@ -352,21 +411,89 @@ def _decide_status_reason(payload_out: Dict[str, Any], threshold: float) -> Tupl
     return "needs_review", reason, _pick_followup_questions(top_ev)
 
 
-def _post_webhook(callback_url: str, body: Dict[str, Any], *, retries: int = 3, timeout: float = 30.0) -> None:
+_WEBHOOK_LIMITS = httpx.Limits(max_keepalive_connections=32)
+_webhook_client: Optional[httpx.AsyncClient] = None
+
+# 同時送信数の上限（全体 / 送信先ホストごと）
+# 遅い受け手がいても、他ホスト宛ての webhook が巻き添えで詰まらないようにする
+_WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "16"))
+_WEBHOOK_MAX_PER_HOST = int(os.getenv("WEBHOOK_MAX_PER_HOST", "4"))
+_webhook_slots: Optional[asyncio.Semaphore] = None
+_webhook_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+# HTTP/2 は h2 が入っている環境だけ有効にする（httpx は h2 無しで http2=True にすると例外）
+try:
+    import h2  # noqa: F401
+
+    _WEBHOOK_HTTP2 = True
+except ImportError:  # pragma: no cover
+    _WEBHOOK_HTTP2 = False
+
+# リトライ待ち: min(base * 2**attempt, max) に full jitter をかける
+_WEBHOOK_BACKOFF_BASE = 0.5
+_WEBHOOK_BACKOFF_MAX = 8.0
+
+
+def _webhook_backoff(attempt: int) -> float:
+    delay = min(_WEBHOOK_BACKOFF_BASE * (2**attempt), _WEBHOOK_BACKOFF_MAX)
+    return delay * (0.5 + random.random() * 0.5)
+
+
+def _get_webhook_client() -> httpx.AsyncClient:
+    """
+    webhook 用の AsyncClient をプロセス内で使い回す（リトライ・リクエスト間で TCP/TLS を再利用）
+    event loop 上で初回に作る
+    """
+    global _webhook_client, _webhook_slots
+    if _webhook_client is None or _webhook_client.is_closed:
+        # Semaphore も event loop に紐づくので client と一緒に作り直す
+        _webhook_slots = asyncio.Semaphore(_WEBHOOK_MAX_CONCURRENCY)
+        _webhook_host_slots.clear()
+        _webhook_client = httpx.AsyncClient(
+            timeout=30.0, limits=_WEBHOOK_LIMITS, http2=_WEBHOOK_HTTP2
+        )
+    return _webhook_client
+
+
+def _webhook_host_slot(callback_url: str) -> asyncio.Semaphore:
+    host = httpx.URL(callback_url).host
+    slot = _webhook_host_slots.get(host)
+    if slot is None:
+        slot = _webhook_host_slots[host] = asyncio.Semaphore(_WEBHOOK_MAX_PER_HOST)
+    return slot
+
+
+async def close_webhook_client() -> None:
+    """app の lifespan 終了時に呼ぶ"""
+    global _webhook_client
+    if _webhook_client is not None:
+        await _webhook_client.aclose()
+        _webhook_client = None
+
+
+async def _post_webhook(callback_url: str, body: Dict[str, Any], *, retries: int = 3, timeout: float = 30.0) -> None:
     """
     webhook は失敗しやすいので最小のリトライを入れる（PoCでも効く）
     """
+    client = _get_webhook_client()
+    host_slot = _webhook_host_slot(callback_url)
+    # body のシリアライズはリトライ間で 1 回だけ
+    content = _json_dumps_safe(body).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
     last_err: Optional[Exception] = None
     for i in range(retries):
         try:
-            with httpx.Client(timeout=timeout) as client:
-                r = client.post(callback_url, json=body)
-                r.raise_for_status()
+            # 枠は送信中だけ持つ（backoff の sleep 中は他の webhook に譲る）
+            async with _webhook_slots, host_slot:
+                r = await client.post(callback_url, content=content, headers=headers, timeout=timeout)
+            r.raise_for_status()
             return
         except Exception as e:
             last_err = e
-            # 0.5s, 1s, 2s… くらい
-            time.sleep(0.5 * (2**i))
+            if i == retries - 1:
+                break
+            # 同時失敗時に相手先へ一斉に再送しない（上限付き + jitter）
+            await asyncio.sleep(_webhook_backoff(i))
     # 最後に例外を投げる（呼び元で error 記録される）
     raise RuntimeError(f"webhook post failed after {retries} retries: {last_err}")
 
@@ -374,17 +501,16 @@ def _post_webhook(callback_url: str, body: Dict[str, Any], *, retries: int = 3,
 # =============================================================================
 # background entrypoint (Route 1)
 # =============================================================================
-def process_external_request(request_id: int, threshold: float = DEFAULT_THRESHOLD) -> None:
+def _evaluate_external_request(request_id: int, threshold: float) -> Optional[Tuple[str, Dict[str, Any]]]:
     """
-    Background task entrypoint (Route 1: webhook返却)
-      - request_id は ExternalEvalRequest.id (int) を想定
+    同期部分（DB + pipeline）。threadpool 上で実行し、送信先と webhook body を返す
       - SQLite locked 回避のため SessionLocal を作り直す
     """
     db = SessionLocal()
     try:
-        req = db.query(ExternalEvalRequest).filter(ExternalEvalRequest.id == request_id).first()
+        req = db.get(ExternalEvalRequest, request_id)
         if not req:
-            return
+            return None
 
         # payload_in は「文字列JSON」想定だが、揺れを吸収
         payload_in = _json_loads_safe(getattr(req, "payload_in", None), default={})
@@ -403,12 +529,9 @@ def process_external_request(request_id: int, threshold: float = DEFAULT_THRESHO
         if not callback:
             raise ValueError("callback_webhook is missing")
 
-        # 状態更新
-        req.status = "running"
-        db.commit()
-
-        # Transaction 生成
+        # Transaction 生成 + 状態更新（running と transaction_id は 1 回の commit でまとめて書く）
         tx_id = create_transaction_from_payload(db, payload_in)
+        req.status = "running"
         if hasattr(req, "transaction_id"):
             req.transaction_id = tx_id
         db.commit()
@@ -437,41 +560,64 @@ def process_external_request(request_id: int, threshold: float = DEFAULT_THRESHO
             "reason": reason,
             "payload": payload_out,
         }
-        _post_webhook(str(callback), webhook_body, retries=3, timeout=30.0)
+        return str(callback), webhook_body
+    finally:
+        db.close()
+
+
+def _record_external_error(request_id: int, err: Exception) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    error をDBに記録し、error webhook の送信先と body を返す（callback が無ければ None）
+    """
+    db = SessionLocal()
+    try:
+        req2 = db.get(ExternalEvalRequest, request_id)
+        if not req2:
+            return None
+        req2.status = "error"
+        req2.reason = str(err)
+        db.commit()
+
+        cb = getattr(req2, "callback_webhook", None)
+        payload_in2 = _json_loads_safe(getattr(req2, "payload_in", None), default={})
+        if not cb:
+            cb = payload_in2.get("callback_webhook")
+        if not cb or payload_in2.get("product_id") is None:
+            return None
+        return str(cb), {
+            "product_id": int(payload_in2["product_id"]),
+            "request_id": int(request_id),
+            "status": "error",
+            "reason": str(err),
+            "payload": None,
+        }
+    finally:
+        db.close()
+
+
+async def process_external_request(request_id: int, threshold: float = DEFAULT_THRESHOLD) -> None:
+    """
+    Background task entrypoint (Route 1: webhook返却)
+      - request_id は ExternalEvalRequest.id (int) を想定
+      - DB / pipeline は threadpool、webhook 送信は event loop 上の共有 AsyncClient で行う
+    """
+    try:
+        target = await run_in_threadpool(_evaluate_external_request, request_id, threshold)
+        if target is None:
+            return
+        callback, webhook_body = target
+        await _post_webhook(callback, webhook_body, retries=3, timeout=30.0)
 
     except Exception as e:
         # error をDBに記録し、可能なら error webhook も返す
         try:
-            req2 = db.query(ExternalEvalRequest).filter(ExternalEvalRequest.id == request_id).first()
-            if req2:
-                req2.status = "error"
-                req2.reason = str(e)
-                db.commit()
-
-                # error webhook（callback があれば）
-                cb = getattr(req2, "callback_webhook", None)
-                payload_in2 = _json_loads_safe(getattr(req2, "payload_in", None), default={})
-                if not cb:
-                    cb = payload_in2.get("callback_webhook")
-                if cb and payload_in2.get("product_id") is not None:
-                    try:
-                        _post_webhook(
-                            str(cb),
-                            {
-                                "product_id": int(payload_in2["product_id"]),
-                                "request_id": int(request_id),
-                                "status": "error",
-                                "reason": str(e),
-                                "payload": None,
-                            },
-                            retries=2,
-                            timeout=20.0,
-                        )
-                    except Exception:
-                        pass
+            err_target = await run_in_threadpool(_record_external_error, request_id, e)
+            if err_target:
+                try:
+                    await _post_webhook(err_target[0], err_target[1], retries=2, timeout=20.0)
+                except Exception:
+                    pass
         finally:
             # サーバが落ちるのを避けたい場合は raise しない選択肢もあるが、
             # PoCでは原因追跡しやすいように raise する
             raise
-    finally:
-        db.close()
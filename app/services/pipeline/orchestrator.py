@@ -1,8 +1,11 @@
 # app/services/pipeline/orchestrator.py
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Any
 from sqlalchemy.orm import Session
 
-from app.db.models.ai_run import RunType
+from app.db.enums import RunType
+from app.db.session import IS_SQLITE, SessionLocal
 from app.services.pipeline.runner import execute_step
 
 from app.services.pipeline.steps.usage_extract import step_usage_extract
@@ -10,8 +13,32 @@ from app.services.pipeline.steps.patent_retrieve import step_patent_retrieve
 from app.services.pipeline.steps.usage_expand import step_usage_expand
 from app.services.pipeline.steps.matrix_match import step_matrix_match
 
+# patent_retrieve と matrix_match を並列に回す（PIPELINE_PARALLEL=0 で従来どおり直列）
+# SQLite は常に直列：書き込みロックが DB 全体で 1 本なので、patent_retrieve が DELETE 後に
+# index 構築・encode している間 matrix_match の DELETE が busy_timeout で "database is locked" になる
+# （in-memory は接続ごとに別 DB になるのでそもそも並列にできない）
+PIPELINE_PARALLEL = os.getenv("PIPELINE_PARALLEL", "1") != "0" and not IS_SQLITE
+
+# 並列枝は 1 本だけなので小さな共有プールで十分
+_STEP_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline-step")
+
+
+def _execute_step_in_own_session(bind, **kwargs) -> Dict[str, Any]:
+    # Session はスレッド間で共有できないので、並列枝は別 Session（同じ bind）で実行する
+    db = SessionLocal(bind=bind)
+    try:
+        return execute_step(db=db, **kwargs)
+    finally:
+        db.close()
+
 
 def run_until_matrix_match(db: Session, transaction_id: int, threshold: float = 0.75) -> Dict[str, Any]:
+    """
+    usage_extract -> usage_expand -> (patent_retrieve ∥ matrix_match)
+
+    patent_retrieve と matrix_match はどちらも usage_requirements を読むだけで、
+    互いの結果には依存しないので、usage 側が確定した後に並列で実行する。
+    """
     r1 = execute_step(
         db=db,
         transaction_id=transaction_id,
@@ -22,16 +49,6 @@ def run_until_matrix_match(db: Session, transaction_id: int, threshold: float =
         prompt_version="usage_extract_v1",
     )
 
-    r2 = execute_step(
-        db=db,
-        transaction_id=transaction_id,
-        run_type=RunType.patent_retrieve,
-        step_fn=step_patent_retrieve,
-        params={"top_k": 10},
-        model_name="local",
-        prompt_version="patent_retrieve_v1",
-    )
-
     r3 = execute_step(
         db=db,
         transaction_id=transaction_id,
@@ -42,15 +59,37 @@ def run_until_matrix_match(db: Session, transaction_id: int, threshold: float =
         prompt_version="usage_expand_v1",
     )
 
-    r4 = execute_step(
-        db=db,
+    patent_kwargs: Dict[str, Any] = dict(
         transaction_id=transaction_id,
-        run_type=RunType.matrix_match,
-        step_fn=step_matrix_match,
-        params={"threshold": threshold, "regime": "JP_FX", "top_k_per_usage": 10},
+        run_type=RunType.patent_retrieve,
+        step_fn=step_patent_retrieve,
+        params={"top_k": 10},
         model_name="local",
-        prompt_version="matrix_match_v2_fx",
+        prompt_version="patent_retrieve_v1",
     )
+    if PIPELINE_PARALLEL:
+        f2 = _STEP_POOL.submit(_execute_step_in_own_session, db.get_bind(), **patent_kwargs)
+    else:
+        f2 = None
+        r2 = execute_step(db=db, **patent_kwargs)
+
+    try:
+        r4 = execute_step(
+            db=db,
+            transaction_id=transaction_id,
+            run_type=RunType.matrix_match,
+            step_fn=step_matrix_match,
+            params={"threshold": threshold, "regime": "JP_FX", "top_k_per_usage": 10},
+            model_name="local",
+            prompt_version="matrix_match_v2_fx",
+        )
+    finally:
+        # matrix_match が失敗しても並列枝は待ってから抜ける（失敗の記録を取りこぼさない）
+        if f2 is not None:
+            wait([f2])
+
+    if f2 is not None:
+        r2 = f2.result()
 
     return {
         "usage_extract": r1,
@@ -6,7 +6,8 @@ from typing import Any, Callable, Dict, Optional
 
 from sqlalchemy.orm import Session
 
-from app.db.models.ai_run import AiRun, RunStatus, RunType
+from app.db.enums import RunStatus, RunType
+from app.db.models.ai_run import AiRun
 
 
 @contextmanager
@@ -34,7 +35,6 @@ def create_run(
         model_name=model_name,
         prompt_version=prompt_version,
         params=params or {},
-        started_at=datetime.utcnow(),
     )
     db.add(run)
     db.flush()
@@ -43,6 +43,8 @@ def create_run(
 
 def finalize_run_success(db: Session, run: AiRun):
     run.status = RunStatus.success.value
+    # step ごとに 1 回だけなのでアプリ側の時刻で良い
+    # （func.now() は Postgres ではトランザクション開始時刻になり、step の終了時刻にならない）
     run.finished_at = datetime.utcnow()
     db.add(run)
 
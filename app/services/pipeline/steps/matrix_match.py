@@ -1,17 +1,28 @@
 # app/services/pipeline/steps/matrix_match.py
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import re
-from datetime import datetime
-from typing import Dict, Any, List, Tuple, Optional
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Sequence, Tuple, Optional
 
-from sqlalchemy.orm import Session
-from sqlalchemy import inspect
+import numpy as np
+from scipy import sparse
+
+try:
+    import orjson
+except ImportError:  # orjson は任意（無ければ標準 json）
+    orjson = None  # type: ignore[assignment]
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy import Integer, delete, func, insert, inspect, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from app.db.models.matrix import MatrixRule
-from app.db.models.ai_run import MatrixMatch
+from app.db.bulk import bulk_insert_matrix_matches
+from app.db.models.ai_run import MatrixMatch, MatrixMatchCache
 from app.db.models.transaction import UsageRequirement
 
 
@@ -26,8 +37,14 @@ def _project_root() -> str:
 
 
 def _read_matrix_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except ValueError:
+            pass  # NaN / 64bit 超の int など orjson が受け付けないものは標準 json に任せる
+    return json.loads(raw)
 
 
 def _safe_str(x: Any) -> str:
@@ -151,33 +168,73 @@ def _flatten_matrix_json_to_rules(doc: Dict[str, Any], regime: str) -> List[Dict
     return out
 
 
+# (path, regime) -> (mtime, size, ingest 後の matrix_rules 件数, total_in_json)
+_INGEST_STATE: Dict[Tuple[str, str], Tuple[float, int, int, int]] = {}
+
+
+def _regime_rule_count(db: Session, regime: str) -> int:
+    return int(db.query(func.count(MatrixRule.id)).filter(MatrixRule.regime == regime).scalar() or 0)
+
+
 def _upsert_matrix_rules_from_json(db: Session, json_path: str, regime: str) -> Dict[str, int]:
     """
     JSON -> matrix_rules へ upsert
     key: (regime, item_no, version)
+
+    ファイルの (mtime, size) が前回 ingest 時と同じで、DB 側の件数も変わっていなければ
+    JSON のパースも upsert もしない（毎 run の再 ingest を避ける）
     """
+    st = os.stat(json_path)
+    state_key = (os.path.abspath(json_path), regime)
+    prev = _INGEST_STATE.get(state_key)
+    if prev is not None and prev[:2] == (st.st_mtime, st.st_size) and _regime_rule_count(db, regime) == prev[2]:
+        return {"inserted": 0, "updated": 0, "total_in_json": prev[3], "skipped": 1}
+
     doc = _read_matrix_json(json_path)
     rows = _flatten_matrix_json_to_rules(doc, regime=regime)
 
     inserted = 0
     updated = 0
 
+    # 既存 rule を 1 クエリでまとめて引き、行ごとの SELECT（N+1）をしない
+    existing = (
+        db.query(MatrixRule)
+        .options(undefer_group("details"))
+        .filter(MatrixRule.regime.in_({r["regime"] for r in rows}))
+        .order_by(MatrixRule.id)
+        .all()
+    )
+    # 値は既存の MatrixRule か、この JSON 内で先に出た新規行の dict
+    by_version: Dict[Tuple[str, str, Optional[str]], Any] = {}
+    by_item: Dict[Tuple[str, str], Any] = {}
+    new_rows: List[Dict[str, Any]] = []
+    for obj in existing:
+        by_version.setdefault((obj.regime, obj.item_no, obj.version), obj)
+        by_item.setdefault((obj.regime, obj.item_no), obj)
+
     for r in rows:
         key_regime = r["regime"]
         key_item_no = r["item_no"]
         key_version = r.get("version")
 
-        q = (
-            db.query(MatrixRule)
-            .filter(MatrixRule.regime == key_regime)
-            .filter(MatrixRule.item_no == key_item_no)
-        )
         # version がある運用なら version もキーへ
         if key_version is not None:
-            q = q.filter(MatrixRule.version == key_version)
+            obj = by_version.get((key_regime, key_item_no, key_version))
+        else:
+            obj = by_item.get((key_regime, key_item_no))
 
-        obj = q.first()
-        if obj:
+        if isinstance(obj, dict):
+            # 同じ JSON 内の重複キー：後勝ちで新規行を上書き
+            obj.update(
+                list_name=r.get("list_name"),
+                title=r.get("title"),
+                requirement_text=r.get("requirement_text") or obj["requirement_text"],
+                usage_criteria_text=r.get("usage_criteria_text"),
+                tech_criteria_text=r.get("tech_criteria_text"),
+                notes=r.get("notes"),
+                effective_date=r.get("effective_date"),
+            )
+        elif obj:
             # update
             obj.list_name = r.get("list_name")
             obj.title = r.get("title")
@@ -187,11 +244,10 @@ def _upsert_matrix_rules_from_json(db: Session, json_path: str, regime: str) ->
             obj.notes = r.get("notes")
             obj.version = r.get("version")
             obj.effective_date = r.get("effective_date")
-            obj.updated_at = datetime.utcnow()
             updated += 1
         else:
-            # insert
-            obj = MatrixRule(
+            # insert（最後に executemany でまとめて流す）
+            new_row = dict(
                 regime=r["regime"],
                 list_name=r.get("list_name"),
                 item_no=r["item_no"],
@@ -202,13 +258,21 @@ def _upsert_matrix_rules_from_json(db: Session, json_path: str, regime: str) ->
                 notes=r.get("notes"),
                 version=r.get("version"),
                 effective_date=r.get("effective_date"),
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
             )
-            db.add(obj)
+            new_rows.append(new_row)
+            by_version.setdefault((key_regime, key_item_no, key_version), new_row)
+            by_item.setdefault((key_regime, key_item_no), new_row)
             inserted += 1
 
+    # 実際に値が変わった時だけ rule pack キャッシュを捨てる
+    # （updated_at は秒精度なので、同じ秒内の更新をキー比較だけでは取りこぼす）
+    changed = bool(new_rows) or any(db.is_modified(o) for o in db.dirty)
+    if new_rows:
+        db.execute(insert(MatrixRule), new_rows)
     db.commit()
+    if changed:
+        _RULE_PACK_CACHE.pop(regime, None)
+    _INGEST_STATE[state_key] = (st.st_mtime, st.st_size, _regime_rule_count(db, regime), len(rows))
     return {"inserted": inserted, "updated": updated, "total_in_json": len(rows)}
 
 
@@ -217,6 +281,7 @@ def _upsert_matrix_rules_from_json(db: Session, json_path: str, regime: str) ->
 # -----------------------------
 _LATIN_RE = re.compile(r"[A-Za-z0-9]+")
 _JP_BLOCK_RE = re.compile(r"[\u3040-\u30ff\u4e00-\u9fff]+")
+_WS_RE = re.compile(r"\s+")
 
 
 def _normalize_text(s: str) -> str:
@@ -226,41 +291,37 @@ def _normalize_text(s: str) -> str:
     t = t.replace("（", "(").replace("）", ")")
     t = t.replace("，", ",").replace("．", ".").replace("・", " ")
     t = t.replace("－", "-").replace("―", "-").replace("−", "-")
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _WS_RE.sub(" ", t).strip()
     return t
 
 
-def _ngrams(s: str, n: int) -> List[str]:
-    if not s or len(s) < n:
-        return []
-    return [s[i : i + n] for i in range(0, len(s) - n + 1)]
-
-
-def _tokenize(text: str) -> List[str]:
+@lru_cache(maxsize=4096)
+def _tokenize(text: str) -> Tuple[str, ...]:
+    # rule / usage のテキストは run をまたいで繰り返し来るのでキャッシュ（戻り値は不変の tuple）
     t = _normalize_text(text)
     if not t:
-        return []
+        return ()
 
-    tokens: List[str] = []
-    tokens.extend(_LATIN_RE.findall(t))
+    # dict を挿入順付きの set として使う（中間 list と 2 回目の重複除去を省く）
+    seen: Dict[str, None] = dict.fromkeys(_LATIN_RE.findall(t))
 
     for m in _JP_BLOCK_RE.finditer(t):
         block = m.group(0)
-        tokens.extend(_ngrams(block, 2))
-        tokens.extend(_ngrams(block, 3))
-
-    seen = set()
-    out: List[str] = []
-    for x in tokens:
-        if x and x not in seen:
-            seen.add(x)
-            out.append(x)
-    return out
+        n = len(block)
+        for i in range(n - 1):
+            seen[block[i : i + 2]] = None
+        for i in range(n - 2):
+            seen[block[i : i + 3]] = None
+
+    return tuple(seen)
 
 
-def _binary_cosine(a_tokens: List[str], b_tokens: List[str]) -> Tuple[float, List[str]]:
-    A = set(a_tokens)
-    B = set(b_tokens)
+def _binary_cosine(A: FrozenSet[str], B: FrozenSet[str]) -> Tuple[float, List[str]]:
+    """
+    1 組分の binary cosine と matched_tokens。
+    全組のスコアは _score_matrix で一括計算するので、ここは保存する上位 k 組の matched_tokens 復元にだけ使う
+    （サイズからの上限値で枝刈りする余地は無い: 閾値未満でも上位 k は maybe として残すため）
+    """
     if not A or not B:
         return 0.0, []
 
@@ -271,14 +332,210 @@ def _binary_cosine(a_tokens: List[str], b_tokens: List[str]) -> Tuple[float, Lis
     return float(score), matched
 
 
+# (rule_id, item_no, title, rule_text, tokens)
+RulePackEntry = Tuple[int, Optional[str], Optional[str], str, FrozenSet[str]]
+
+
+
+class RulePack(NamedTuple):
+    entries: List[RulePackEntry]
+    vocab: Dict[str, int]            # token -> 列番号
+    postings: sparse.csr_matrix      # V × n_rules（0/1）= token → rule の転置インデックス
+    sizes: np.ndarray                # 各 rule のトークン数 |B|
+    digest: str                      # rule (id, 本文) の内容ハッシュ（matrix_match_cache のキーに使う）
+
+
+# regime -> ((max(updated_at), count), RulePack)
+# ORM オブジェクトはセッションをまたげないので、必要な値だけ tuple で持つ
+_RULE_PACK_CACHE: Dict[str, Tuple[Tuple[Any, int], RulePack]] = {}
+
+
+def _binary_matrix(token_sets: Sequence[FrozenSet[str]], vocab: Dict[str, int]) -> sparse.csr_matrix:
+    """
+    token 集合の列 → 0/1 の CSR 行列（vocab に無いトークンは列を持たない）
+    トークンは int32 の ID に落とし、各行の ID は昇順に並べておく（疎行列積がソート済み前提で回る）
+    値は int32 にして、積 |A∩B| を整数のまま数える
+    """
+    lengths = np.zeros(len(token_sets) + 1, dtype=np.int64)
+    rows: List[np.ndarray] = []
+    for i, toks in enumerate(token_sets):
+        ids = np.fromiter((vocab[t] for t in toks if t in vocab), dtype=np.int32)
+        ids.sort()
+        rows.append(ids)
+        lengths[i + 1] = ids.size
+    indptr = np.cumsum(lengths)
+    indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    data = np.ones(indices.size, dtype=np.int32)
+    m = sparse.csr_matrix((data, indices, indptr), shape=(len(token_sets), len(vocab)))
+    m.has_sorted_indices = True
+    return m
+
+
+def _build_rule_pack(entries: List[RulePackEntry]) -> RulePack:
+    vocab: Dict[str, int] = {}
+    for entry in entries:
+        for t in entry[4]:
+            vocab.setdefault(t, len(vocab))
+    matrix = _binary_matrix([e[4] for e in entries], vocab)
+    # 照合のたびに転置しないよう、token → rule の postings として CSR で持っておく
+    postings = matrix.T.tocsr()
+    postings.sort_indices()
+    sizes = np.array([len(e[4]) for e in entries], dtype=np.float64)
+    h = hashlib.blake2b(digest_size=16)
+    for e in entries:
+        h.update(f"{e[0]}\x1f{e[3]}\x1e".encode("utf-8"))
+    return RulePack(entries, vocab, postings, sizes, h.hexdigest())
+
+
+def _score_matrix(pack: RulePack, usage_sets: Sequence[FrozenSet[str]]) -> np.ndarray:
+    """
+    binary cosine を usages × rules まとめて計算する（疎行列積 1 回）
+      score = |A∩B| / sqrt(|A|·|B|)
+    U @ postings は usage の各トークンの postings だけを辿って rule ごとの共通数を足し込む
+    （共通トークンが 1 つも無い rule は触らない = 転置インデックスでの集計と同じ）
+    |A| は vocab 外のトークンも含めた usage 側のトークン数（_binary_cosine と同じ値になる）
+    """
+    U = _binary_matrix(usage_sets, pack.vocab)
+    inter = (U @ pack.postings).toarray()  # int32 の共通トークン数
+    u_sizes = np.array([len(s) for s in usage_sets], dtype=np.float64)
+    return inter / np.sqrt(u_sizes[:, None] * pack.sizes[None, :])
+
+
+def _top_k_indices(row: np.ndarray, k: int) -> np.ndarray:
+    """
+    row の上位 k 件の index（score 降順、同点は index 昇順 = 全件 stable sort と同じ並び）
+    全件ソートせず argpartition で候補だけ絞る
+    """
+    n = row.shape[0]
+    if k >= n:
+        return np.argsort(-row, kind="stable")
+    kth = row[np.argpartition(row, n - k)[n - k]]
+    above = np.flatnonzero(row > kth)
+    ties = np.flatnonzero(row == kth)[: k - above.size]
+    cand = np.sort(np.concatenate([above, ties]))
+    return cand[np.argsort(-row[cand], kind="stable")]
+
+
+def _load_rule_pack(db: Session, regime: str) -> Tuple[int, RulePack]:
+    """
+    regime の rule token pack を返す（rule 件数も返す）。
+    (max(updated_at), count) が前回と同じならトークン化をやり直さずキャッシュを返す。
+    アプリ内の ingest で変更があった場合は _upsert_matrix_rules_from_json 側で明示的に捨てる。
+    """
+    max_updated, rule_count = (
+        db.query(func.max(MatrixRule.updated_at), func.count(MatrixRule.id))
+        .filter(MatrixRule.regime == regime)
+        .one()
+    )
+    rule_count = int(rule_count or 0)
+    key = (max_updated, rule_count)
+
+    cached = _RULE_PACK_CACHE.get(regime)
+    if cached is not None and cached[0] == key:
+        return rule_count, cached[1]
+
+    # ORM オブジェクトは作らず、必要な列だけを yield_per で流しながらトークン化する
+    # （全 rule の本文を一度にメモリへ載せない。残すのは pack 用の tuple だけ）
+    rule_rows = db.execute(
+        select(
+            MatrixRule.id,
+            MatrixRule.item_no,
+            MatrixRule.title,
+            MatrixRule.requirement_text,
+            MatrixRule.usage_criteria_text,
+            MatrixRule.tech_criteria_text,
+            MatrixRule.notes,
+            MatrixRule.list_name,
+        )
+        .where(MatrixRule.regime == regime)
+        .order_by(MatrixRule.id)
+        .execution_options(yield_per=256)
+    )
+
+    rule_pack: List[RulePackEntry] = []
+    for rule_id, item_no, title, requirement_text, usage_criteria_text, tech_criteria_text, notes, list_name in rule_rows:
+        parts = [
+            (title or "").strip(),
+            (requirement_text or "").strip(),
+            (usage_criteria_text or "").strip(),
+            (tech_criteria_text or "").strip(),
+            (notes or "").strip(),
+            (item_no or "").strip(),
+            (list_name or "").strip(),
+        ]
+        rule_text = "\n".join([p for p in parts if p])
+        rtoks = frozenset(_tokenize(rule_text))
+        if rtoks:
+            rule_pack.append((rule_id, item_no, title, rule_text, rtoks))
+
+    pack = _build_rule_pack(rule_pack)
+    _RULE_PACK_CACHE[regime] = (key, pack)
+    return rule_count, pack
+
+
+@lru_cache(maxsize=64)
+def _table_columns(bind: Any, table_name: str) -> FrozenSet[str]:
+    # スキーマは実行中に変わらない前提で engine × table ごとに 1 回だけ見る
+    # （例外はキャッシュされないので、一時的な失敗は次回また見に行く）
+    return frozenset(c["name"] for c in inspect(bind).get_columns(table_name))
+
+
 def _table_has_column(db: Session, table_name: str, col_name: str) -> bool:
     try:
-        cols = inspect(db.get_bind()).get_columns(table_name)
-        return any(c["name"] == col_name for c in cols)
+        return col_name in _table_columns(db.get_bind(), table_name)
     except Exception:
         return False
 
 
+# matrix_matches のうちキャッシュヒット時にコピーする列（id / ai_run_id / 時刻以外）
+_MM_COPY_COLUMNS = tuple(
+    c.name for c in MatrixMatch.__table__.columns if c.name not in ("id", "ai_run_id", "created_at", "updated_at")
+)
+
+
+def _match_cache_key(
+    regime: str,
+    rule_digest: str,
+    threshold: float,
+    top_k_per_usage: int,
+    column_flags: Tuple[bool, ...],
+    usage_digest: str,
+) -> str:
+    raw = f"{regime}|{rule_digest}|{threshold!r}|{top_k_per_usage}|{column_flags}|{usage_digest}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=32).hexdigest()
+
+
+def _copy_cached_matches(db: Session, source_run_id: int, run_id: int) -> int:
+    """source_run の matrix_matches を run_id 付きで INSERT ... SELECT 1 文でコピーする"""
+    existing = _table_columns(db.get_bind(), "matrix_matches")
+    cols = [c for c in _MM_COPY_COLUMNS if c in existing]
+    src = MatrixMatch.__table__
+    stmt = insert(src).from_select(
+        ["ai_run_id", *cols],
+        select(literal(run_id, Integer), *[src.c[c] for c in cols])
+        .where(src.c.ai_run_id == source_run_id)
+        .order_by(src.c.id),
+    )
+    return db.execute(stmt).rowcount or 0
+
+
+def _store_match_cache(db: Session, key: str, run_id: int) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = pg_insert(MatrixMatchCache)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(MatrixMatchCache)
+    else:
+        db.execute(delete(MatrixMatchCache).where(MatrixMatchCache.key == key))
+        db.execute(insert(MatrixMatchCache).values(key=key, source_run_id=run_id))
+        return
+    # 同じ入力の run が並行して走った場合は後勝ち
+    stmt = stmt.values(key=key, source_run_id=run_id).on_conflict_do_update(
+        index_elements=["key"], set_={"source_run_id": run_id}
+    )
+    db.execute(stmt)
+
+
 def step_matrix_match(
     db: Session,
     transaction_id: int,
@@ -292,18 +549,21 @@ def step_matrix_match(
       * params["matrix_json_path"] でパス上書き可能
     - threshold 以上は decision="hit"
     - threshold 未満でも上位 top_k_per_usage は decision="maybe" として保存（0件回避）
-    - evidence_json / updated_at 等は「実DBにカラムがある時だけ」埋める
+    - evidence_json 等は「実DBにカラムがある時だけ」埋める（created_at / updated_at は server_default）
+    - usage / rule の内容・threshold・top_k が前回と同じなら、スコア計算せず前回 run の結果をコピーする
+      * params["use_cache"]=False で無効化
     """
     threshold = float(params.get("threshold", 0.75))
     regime = str(params.get("regime", "JP_FX"))
     top_k_per_usage = int(params.get("top_k_per_usage", 10))
     top_k_per_usage = max(top_k_per_usage, 1)
+    use_cache = bool(params.get("use_cache", True))
 
     # --- detect real DB columns ---
     has_evidence_json = _table_has_column(db, "matrix_matches", "evidence_json")
     has_decision = _table_has_column(db, "matrix_matches", "decision")
-    has_created_at = _table_has_column(db, "matrix_matches", "created_at")
-    has_updated_at = _table_has_column(db, "matrix_matches", "updated_at")
+    has_rule_cols = _table_has_column(db, "matrix_matches", "rule_item_no")
+    use_cache = use_cache and _table_has_column(db, "matrix_match_cache", "source_run_id")
 
     # --- ensure matrix_rules are loaded from data/matrix.json (optional ingest) ---
     matrix_json_path = str(params.get("matrix_json_path") or "").strip()
@@ -319,15 +579,27 @@ def step_matrix_match(
         ingest_result = {"inserted": 0, "updated": 0, "total_in_json": 0}
 
     # --- delete existing matches for this run_id ---
-    db.query(MatrixMatch).filter(MatrixMatch.ai_run_id == run_id).delete(synchronize_session=False)
-    db.flush()
-
-    usages: List[UsageRequirement] = (
-        db.query(UsageRequirement)
-        .filter(UsageRequirement.transaction_id == transaction_id)
-        .all()
+    # delete と insert は同じトランザクションで、最後の commit 1 回にまとめる
+    db.execute(delete(MatrixMatch).where(MatrixMatch.ai_run_id == run_id))
+
+    # usage も列だけ流してその場でトークン化する（ORM オブジェクトは作らない）
+    usage_rows = db.execute(
+        select(UsageRequirement.id, UsageRequirement.source, UsageRequirement.text)
+        .where(UsageRequirement.transaction_id == transaction_id)
+        .order_by(UsageRequirement.id)
+        .execution_options(yield_per=256)
     )
-    if not usages:
+    usage_count = 0
+    usage_hash = hashlib.blake2b(digest_size=16)
+    scored_usages: List[Tuple[int, Optional[str], FrozenSet[str]]] = []
+    for usage_id, usage_source, usage_text in usage_rows:
+        usage_count += 1
+        usage_hash.update(f"{usage_id}\x1f{usage_source}\x1f{usage_text}\x1e".encode("utf-8"))
+        utoks = frozenset(_tokenize((usage_text or "").strip()))
+        if utoks:
+            scored_usages.append((usage_id, usage_source, utoks))
+
+    if usage_count == 0:
         db.commit()
         return {
             "step": "matrix_match",
@@ -341,7 +613,8 @@ def step_matrix_match(
             "ingest": ingest_result,
         }
 
-    current_rule_count = db.query(MatrixRule).filter(MatrixRule.regime == regime).count()
+    # --- rule token packs（matrix_rules に変更が無ければ前回のトークン化を再利用） ---
+    current_rule_count, rule_pack = _load_rule_pack(db, regime)
     if current_rule_count == 0:
         db.commit()
         return {
@@ -357,93 +630,100 @@ def step_matrix_match(
             "matrix_rules_count": 0,
         }
 
-    # --- load rules ---
-    rules: List[MatrixRule] = (
-        db.query(MatrixRule)
-        .filter(MatrixRule.regime == regime)
-        .all()
+    # --- 同じ入力の結果があればコピーして終わる ---
+    cache_key = _match_cache_key(
+        regime,
+        rule_pack.digest,
+        threshold,
+        top_k_per_usage,
+        (has_decision, has_rule_cols, has_evidence_json),
+        usage_hash.hexdigest(),
     )
-
-    # --- build rule token packs ---
-    rule_pack: List[Tuple[MatrixRule, str, List[str]]] = []
-    for rule in rules:
-        parts = [
-            (rule.title or "").strip(),
-            (rule.requirement_text or "").strip(),
-            (rule.usage_criteria_text or "").strip(),
-            (rule.tech_criteria_text or "").strip(),
-            (rule.notes or "").strip(),
-            (rule.item_no or "").strip(),
-            (rule.list_name or "").strip(),
-        ]
-        rule_text = "\n".join([p for p in parts if p])
-        rtoks = _tokenize(rule_text)
-        if rtoks:
-            rule_pack.append((rule, rule_text, rtoks))
-
-    inserted = 0
-    now = datetime.utcnow()
-
-    for u in usages:
-        ut = (u.text or "").strip()
-        utoks = _tokenize(ut)
-        if not utoks:
+    if use_cache:
+        source_run_id = db.execute(
+            select(MatrixMatchCache.source_run_id).where(MatrixMatchCache.key == cache_key)
+        ).scalar()
+        if source_run_id is not None and source_run_id != run_id:
+            inserted = _copy_cached_matches(db, source_run_id, run_id)
+            db.commit()
+            return {
+                "step": "matrix_match",
+                "transaction_id": transaction_id,
+                "run_id": run_id,
+                "threshold": threshold,
+                "regime": regime,
+                "top_k_per_usage": top_k_per_usage,
+                "inserted": inserted,
+                "usage_count": usage_count,
+                "matrix_rules_count": current_rule_count,
+                "matrix_json_path": matrix_json_path,
+                "ingest": ingest_result,
+                "cache_hit_run_id": source_run_id,
+                "note": "入力が前回と同じため、前回 run の matrix_matches をコピー",
+            }
+
+    mm_rows: List[Dict[str, Any]] = []
+
+    # --- score: usages × rules を疎行列積 1 回で計算 ---
+    scores = _score_matrix(rule_pack, [x[2] for x in scored_usages]) if scored_usages else None
+
+    for row_idx, (usage_id, usage_source, utoks) in enumerate(scored_usages):
+        row = scores[row_idx]
+        # 完全0は保存しない（ノイズ増えすぎ防止）ので、先に正のスコアだけに絞ってから上位 k を取る
+        cand = np.flatnonzero(row > 0.0)
+        if cand.size == 0:
             continue
+        for j in cand[_top_k_indices(row[cand], top_k_per_usage)]:
+            score = float(row[j])
 
-        scored: List[Tuple[float, MatrixRule, str, List[str]]] = []
-        for rule, rule_text, rtoks in rule_pack:
-            score, matched = _binary_cosine(utoks, rtoks)
-            scored.append((score, rule, rule_text, matched))
+            rule_id, item_no, title, rule_text, rtoks = rule_pack.entries[j]
+            # matched_tokens は保存する組だけ集合演算で復元
+            _, matched = _binary_cosine(utoks, rtoks)
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        keep = scored[:top_k_per_usage]
-
-        for score, rule, rule_text, matched in keep:
-            # 完全0は保存しない（ノイズ増えすぎ防止）
-            if score <= 0.0:
-                continue
-
-            match_type = "core_hit" if (u.source or "").lower() == "core" else "expanded_hit"
+            match_type = "core_hit" if (usage_source or "").lower() == "core" else "expanded_hit"
             decision_val = "hit" if score >= threshold else "maybe"
 
-            mm = MatrixMatch(
-                ai_run_id=run_id,
-                matrix_rule_id=rule.id,
-                usage_requirement_id=u.id,
-                match_type=match_type,
-                match_score=float(score),
-            )
+            mm: Dict[str, Any] = {
+                "ai_run_id": run_id,
+                "matrix_rule_id": rule_id,
+                "usage_requirement_id": usage_id,
+                "match_type": match_type,
+                "match_score": float(score),
+            }
 
             # --- set required columns if they exist in REAL DB ---
             if has_decision:
-                setattr(mm, "decision", decision_val)
+                mm["decision"] = decision_val
 
-            if has_created_at:
-                setattr(mm, "created_at", now)
+            rule_item_no = _safe_str(item_no)[:300]
+            rule_title = (title or "")[:200]
+            rule_snippet = rule_text[:900]
 
-            if has_updated_at:
-                setattr(mm, "updated_at", now)
+            if has_rule_cols:
+                mm["rule_item_no"] = rule_item_no
+                mm["rule_title"] = rule_title
+                mm["rule_snippet"] = rule_snippet
 
             if has_evidence_json:
-                evidence = {
+                # rule のメタ・本文は列（と matrix_rules への FK）で引けるので evidence には入れない
+                # usage 本文も usage_requirements にあるので持たない
+                evidence: Dict[str, Any] = {
                     "matched_tokens": matched,
-                    "usage_source": u.source,
-                    "usage_text": ut[:500],
-                    "rule_id": rule.id,
-                    "rule_item_no": _safe_str(rule.item_no)[:300],
-                    "rule_title": (rule.title or "")[:200],
-                    "rule_snippet": rule_text[:900],
-                    "scoring": {
-                        "method": "binary_cosine(jp_2gram_3gram + latin_words)",
-                        "threshold": threshold,
-                        "kept_top_k_per_usage": top_k_per_usage,
-                    },
                     "decision": decision_val,
                 }
-                setattr(mm, "evidence_json", json.dumps(evidence, ensure_ascii=False))
+                if not has_rule_cols:
+                    # rule_* 列が無い旧スキーマだけ従来どおり evidence に載せる
+                    evidence["rule_item_no"] = rule_item_no
+                    evidence["rule_title"] = rule_title
+                    evidence["rule_snippet"] = rule_snippet
+                mm["evidence_json"] = evidence
 
-            db.add(mm)
-            inserted += 1
+            mm_rows.append(mm)
+
+    # 行ごとの db.add() ではなく executemany 1 回で入れる
+    inserted = bulk_insert_matrix_matches(db, mm_rows)
+    if use_cache:
+        _store_match_cache(db, cache_key, run_id)
 
     db.commit()
 
@@ -455,7 +735,7 @@ def step_matrix_match(
         "regime": regime,
         "top_k_per_usage": top_k_per_usage,
         "inserted": inserted,
-        "usage_count": len(usages),
+        "usage_count": usage_count,
         "matrix_rules_count": current_rule_count,
         "matrix_json_path": matrix_json_path,
         "ingest": ingest_result,
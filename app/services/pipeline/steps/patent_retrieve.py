@@ -1,28 +1,127 @@
 # app/services/pipeline/steps/patent_retrieve.py
 from __future__ import annotations
 
+import hashlib
 import json
+import logging
+import math
 import os
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 
+try:
+    import ijson
+except ImportError:  # ijson は任意（無ければ json.load で全体を読む）
+    ijson = None  # type: ignore[assignment]
+
 from sqlalchemy.orm import Session
-from sqlalchemy import inspect
+from sqlalchemy import delete, func, insert, inspect, select, update
 
+from app.db.bulk import bulk_insert_patent_retrievals
 from app.db.models.patent import Patent
 from app.db.models.transaction import UsageRequirement
 from app.db.models.ai_run import PatentRetrieval
 
 
+logger = logging.getLogger(__name__)
+
+
 # =========================
 # Config
 # =========================
 _MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 
+# encode のスレッド数（未指定なら CPU コア数）。OMP_NUM_THREADS=1 は bootstrap 側の既定
+_TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0") or 0) or (os.cpu_count() or 1)
+
+# 推論 backend（torch / onnx / openvino）。onnx は optimum[onnxruntime] が必要で、
+# 初回は ONNX に export してから読む。読めなければ torch に戻す
+_MODEL_BACKEND = os.getenv("PATENT_EMBED_BACKEND", "torch").strip().lower() or "torch"
+
+# PATENT_EMBED_QUANTIZE=1 で torch backend（onnx / openvino では無視）の Linear 層を int8 動的量子化する（重み 1/4・int8 GEMM）
+_MODEL_QUANTIZE = os.getenv("PATENT_EMBED_QUANTIZE", "0") == "1"
+
+_model: Optional[SentenceTransformer] = None
+# 埋め込みの出どころ（実際にロードできた backend・量子化。_get_model で決まる）
+# backend・量子化が変われば query cache も index も別物として扱う
+_model_variant: Optional[str] = None
+_model_lock = threading.Lock()
+
+
+def _load_model() -> Tuple[SentenceTransformer, str]:
+    """モデルと、実際に効いた backend・量子化のラベル（env で頼んだものではなく結果）を返す"""
+    if _MODEL_BACKEND != "torch":
+        try:
+            # ONNX Runtime / OpenVINO は attention・layernorm を融合したグラフで CPU 推論する
+            return SentenceTransformer(_MODEL_NAME, backend=_MODEL_BACKEND), _MODEL_BACKEND
+        except Exception as e:
+            # optimum / onnxruntime 未導入や ONNX export 失敗。env で頼まれた backend なので黙って捨てない
+            logger.warning(
+                "PATENT_EMBED_BACKEND=%s could not be loaded (%r); falling back to torch", _MODEL_BACKEND, e
+            )
+    model = SentenceTransformer(_MODEL_NAME)
+    if _MODEL_QUANTIZE and _quantize_model(model):
+        return model, "torch:int8"
+    return model, "torch"
+
+
+def _quantize_model(model: SentenceTransformer) -> bool:
+    """Linear 層を int8 動的量子化する。できなければ False（fp32 のまま）"""
+    import torch
+
+    try:
+        model[0].auto_model = torch.quantization.quantize_dynamic(
+            model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    except Exception:
+        # 量子化 kernel（fbgemm / qnnpack）が無い環境ではそのまま fp32 で使う
+        return False
+    return True
+
+
+def _get_model() -> SentenceTransformer:
+    """
+    SentenceTransformer はプロセス内で 1 回だけロードして使い回す（重み・tokenizer の読み込みが重い）
+    pipeline の並列枝からも呼ばれるので lock で 1 回に絞る
+    """
+    global _model, _model_variant
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import torch
+
+                # 最初の forward より前に決めておく
+                torch.set_num_threads(max(1, _TORCH_NUM_THREADS))
+                model, label = _load_model()
+                # _model を見たスレッドが必ず variant も見られるよう、先に variant を入れる
+                _model_variant = f"{_MODEL_NAME}:{label}"
+                _model = model
+    return _model
+
+
+def _get_model_variant() -> str:
+    """実際に使う埋め込みモデルのラベル（未ロードならここでロードして確定させる）"""
+    _get_model()
+    assert _model_variant is not None
+    return _model_variant
+
+
+# patent 件数がこれ以上なら IVF+PQ（全件走査をやめる）
+_IVF_MIN_VECTORS = 4096
+# これ以上なら総当たりでも int8 の ScalarQuantizer（vector 1/4・SIMD の int8 内積）。未満は IndexFlatIP
+# （次元ごとの min/max を学習するので、件数が少なすぎると量子化幅が偏る）
+_SQ_MIN_VECTORS = 256
+_IVF_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+_PQ_MAX_SUBQUANTIZERS = 48  # 384 次元なら 8 次元ずつ × 48 = 48 byte / vector
+# index ファイルは mmap で読む（全体を RAM に読み込まず、触ったページだけ page cache に載る）
+_FAISS_MMAP = os.getenv("FAISS_MMAP", "1") != "0"
+
 
 def _project_root() -> str:
     here = os.path.dirname(os.path.abspath(__file__))
@@ -33,25 +132,46 @@ def _faiss_dir() -> str:
     return os.path.join(_project_root(), "data", "faiss")
 
 
-def _faiss_index_path() -> str:
-    return os.path.join(_faiss_dir(), "patents.index")
+def _faiss_stamp_path() -> str:
+    return os.path.join(_faiss_dir(), "patents_meta_stamp.json")
+
+
+def _query_cache_dir() -> str:
+    return os.path.join(_faiss_dir(), "query_cache")
 
 
-def _faiss_meta_path() -> str:
-    return os.path.join(_faiss_dir(), "patents_meta.json")
+def _faiss_index_path() -> str:
+    return os.path.join(_faiss_dir(), "patents.index")
 
 
 # =========================
 # Ingest helpers (patents.json -> DB)
 # =========================
-def _read_patents_json(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
+def _iter_patents_json(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    patents.json（list / {items:[...]}）の要素を 1 件ずつ返す。
+    ijson があればファイル全体を読み込まずにストリームで読む（無ければ json.load）
+    """
+    with open(path, "rb") as f:
+        head = f.read(4096).lstrip()
+        f.seek(0)
+        if ijson is not None and head[:1] in (b"[", b"{"):
+            prefix = "item" if head[:1] == b"[" else "items.item"
+            for it in ijson.items(f, prefix):
+                if isinstance(it, dict):
+                    yield it
+            return
         doc = json.load(f)
+
     if isinstance(doc, list):
-        return doc
-    if isinstance(doc, dict) and isinstance(doc.get("items"), list):
-        return doc["items"]
-    raise ValueError("patents.json must be a list or {items:[...]} JSON")
+        items = doc
+    elif isinstance(doc, dict) and isinstance(doc.get("items"), list):
+        items = doc["items"]
+    else:
+        raise ValueError("patents.json must be a list or {items:[...]} JSON")
+    for it in items:
+        if isinstance(it, dict):
+            yield it
 
 
 def _to_ipc_raw(v: Any) -> Optional[str]:
@@ -64,90 +184,110 @@ def _to_ipc_raw(v: Any) -> Optional[str]:
     return str(v).strip()
 
 
-def _upsert_patents_from_json(db: Session, json_path: str) -> Dict[str, int]:
-    items = _read_patents_json(json_path)
+# patents の実カラム（JSON の揺れをどの列に入れるかを 1 回だけ決める）
+_PATENT_COLUMNS = frozenset(Patent.__table__.columns.keys())
+_IN_CHUNK = 500
+
+
+def _patent_row_from_json(it: Dict[str, Any], pub: str) -> Dict[str, Any]:
+    title = (it.get("title") or "").strip()
+    applicant = (it.get("applicant") or it.get("assignee") or "").strip()
 
+    # ★ ここが “usage_details” ずれ吸収ポイント
+    usage_detail = (
+        it.get("usage_detail")
+        or it.get("usage_details")
+        or it.get("abstract")
+        or it.get("description")
+        or ""
+    ).strip()
+
+    ipc_raw = _to_ipc_raw(it.get("ipc_codes") or it.get("ipc") or it.get("ipc_codes_raw"))
+
+    candidates = {
+        "publication_number": pub,
+        "title": title,
+        "applicant": applicant,
+        "assignee": applicant,
+        "usage_detail": usage_detail,
+        "abstract": usage_detail,
+        "description": usage_detail,
+        "ipc_codes_raw": ipc_raw,
+    }
+    return {k: v for k, v in candidates.items() if k in _PATENT_COLUMNS}
+
+
+def _upsert_patent_rows(db: Session, rows: Dict[str, Dict[str, Any]]) -> Tuple[int, int]:
+    """publication_number → row の 1 チャンク分を INSERT / UPDATE（それぞれ executemany 1 回）"""
+    existing: Dict[str, int] = {}
+    if rows:
+        rows_in_db = db.execute(
+            select(Patent.publication_number, Patent.id).where(Patent.publication_number.in_(list(rows)))
+        ).all()
+        existing.update((pub, pid) for pub, pid in rows_in_db)
+
+    inserts = [row for pub, row in rows.items() if pub not in existing]
+    updates = [{**row, "id": existing[pub]} for pub, row in rows.items() if pub in existing]
+
+    if inserts:
+        db.execute(insert(Patent), inserts)
+    if updates:
+        # 主キー付き dict のリスト → ORM の bulk UPDATE（executemany）
+        db.execute(update(Patent), updates)
+    return len(inserts), len(updates)
+
+
+def _upsert_patents_from_json(db: Session, json_path: str) -> Dict[str, int]:
+    """
+    patents.json → patents
+      - JSON は 1 件ずつ読み、500 件ごとに既存判定（IN 1 回）+ INSERT / UPDATE（executemany）
+      - 同じ publication_number が JSON 内で重複したら後勝ち
+    """
     inserted = 0
     updated = 0
-    now = datetime.utcnow()
+    total = 0
 
-    for it in items:
+    rows: Dict[str, Dict[str, Any]] = {}
+    for it in _iter_patents_json(json_path):
+        total += 1
         pub = (it.get("publication_number") or it.get("pub_number") or "").strip()
         if not pub:
             continue
+        rows[pub] = _patent_row_from_json(it, pub)
+        if len(rows) >= _IN_CHUNK:
+            ins, upd = _upsert_patent_rows(db, rows)
+            inserted += ins
+            updated += upd
+            rows = {}
+
+    ins, upd = _upsert_patent_rows(db, rows)
+    inserted += ins
+    updated += upd
 
-        title = (it.get("title") or "").strip()
-        applicant = (it.get("applicant") or it.get("assignee") or "").strip()
-
-        # ★ ここが “usage_details” ずれ吸収ポイント
-        usage_detail = (
-            it.get("usage_detail")
-            or it.get("usage_details")
-            or it.get("abstract")
-            or it.get("description")
-            or ""
-        ).strip()
-
-        ipc_raw = _to_ipc_raw(it.get("ipc_codes") or it.get("ipc") or it.get("ipc_codes_raw"))
-
-        obj = db.query(Patent).filter(Patent.publication_number == pub).first()
-        if obj:
-            if hasattr(obj, "title"):
-                obj.title = title
-            if hasattr(obj, "applicant"):
-                obj.applicant = applicant
-            if hasattr(obj, "assignee"):
-                obj.assignee = applicant
-            if hasattr(obj, "usage_detail"):
-                obj.usage_detail = usage_detail
-            if hasattr(obj, "abstract"):
-                obj.abstract = usage_detail
-            if hasattr(obj, "description"):
-                obj.description = usage_detail
-            if hasattr(obj, "ipc_codes_raw"):
-                obj.ipc_codes_raw = ipc_raw
-            if hasattr(obj, "updated_at"):
-                obj.updated_at = now
-            updated += 1
-        else:
-            obj = Patent(publication_number=pub)
-            if hasattr(obj, "title"):
-                obj.title = title
-            if hasattr(obj, "applicant"):
-                obj.applicant = applicant
-            if hasattr(obj, "assignee"):
-                obj.assignee = applicant
-            if hasattr(obj, "usage_detail"):
-                obj.usage_detail = usage_detail
-            if hasattr(obj, "abstract"):
-                obj.abstract = usage_detail
-            if hasattr(obj, "description"):
-                obj.description = usage_detail
-            if hasattr(obj, "ipc_codes_raw"):
-                obj.ipc_codes_raw = ipc_raw
-            if hasattr(obj, "created_at"):
-                obj.created_at = now
-            if hasattr(obj, "updated_at"):
-                obj.updated_at = now
-            db.add(obj)
-            inserted += 1
-
-    return {"inserted": inserted, "updated": updated, "total_in_json": len(items)}
+    if inserted or updated:
+        _invalidate_faiss()
+    return {"inserted": inserted, "updated": updated, "total_in_json": total}
 
 
 # =========================
 # FAISS Index Builder / Loader
 # =========================
-def _patent_to_text(p: Patent) -> str:
+# 埋め込みに使う列（実カラムにあるものだけ・import 時に 1 回だけ決める）
+_PATENT_TEXT_KEYS = tuple(
+    k for k in ("title", "usage_detail", "abstract", "description", "ipc_codes_raw") if k in _PATENT_COLUMNS
+)
+
+
+def _patent_to_text(p: Any) -> str:
+    # p は Patent でも select() の Row でもよい（属性名でだけ読む）
     parts: List[str] = []
-    for key in ["title", "usage_detail", "abstract", "description", "ipc_codes_raw"]:
-        if hasattr(p, key):
-            v = getattr(p, key)
-            if isinstance(v, str) and v.strip():
-                parts.append(v.strip())
+    for key in _PATENT_TEXT_KEYS:
+        v = getattr(p, key)
+        if isinstance(v, str) and v.strip():
+            parts.append(v.strip())
     # publication_number は識別子として軽く混ぜる程度
-    if hasattr(p, "publication_number") and getattr(p, "publication_number"):
-        parts.append(str(getattr(p, "publication_number")))
+    if p.publication_number:
+        parts.append(str(p.publication_number))
     return "\n".join(parts).strip()
 
 
@@ -156,108 +296,287 @@ def _ensure_faiss_dir() -> None:
     os.makedirs(d, exist_ok=True)
 
 
-def _load_faiss_if_exists() -> Optional[Tuple[faiss.Index, List[Dict[str, Any]]]]:
+def _patents_stamp(db: Session) -> Dict[str, Any]:
+    """index を作った時点の埋め込みモデルと patents の状態（件数・最大 id・最大 updated_at）。メタデータ 1 クエリで取れる"""
+    count, max_id, max_updated_at = db.execute(
+        select(func.count(Patent.id), func.max(Patent.id), func.max(Patent.updated_at))
+    ).one()
+    return {
+        "model": _get_model_variant(),
+        "count": int(count or 0),
+        "max_id": max_id,
+        "max_updated_at": str(max_updated_at) if max_updated_at is not None else None,
+    }
+
+
+def _load_faiss_if_exists(stamp: Dict[str, Any]) -> Optional[faiss.Index]:
+    """
+    保存済み index を読む。patents が index 作成時から変わっていれば（stamp 不一致・stamp 無し）None
+    """
     ip = _faiss_index_path()
-    mp = _faiss_meta_path()
-    if os.path.exists(ip) and os.path.exists(mp):
+    sp = _faiss_stamp_path()
+    if os.path.exists(ip) and os.path.exists(sp):
         try:
-            index = faiss.read_index(ip)
-            with open(mp, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-            if isinstance(meta, list):
-                return index, meta
+            with open(sp, "r", encoding="utf-8") as f:
+                if json.load(f) != stamp:
+                    return None
+            index = _read_index(ip)
+            # 行番号で引く旧形式（IDMap 無し + patents_meta）は作り直す
+            if isinstance(index, faiss.IndexIDMap2):
+                return _tune_index(index)
         except Exception:
             return None
     return None
 
 
-def _build_faiss_from_db(db: Session) -> Tuple[faiss.Index, List[Dict[str, Any]]]:
-    model = SentenceTransformer(_MODEL_NAME)
+def _read_index(path: str) -> faiss.Index:
+    if _FAISS_MMAP:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+
+def _invalidate_faiss() -> None:
+    # patents を書き換えたら stamp を消して次回 rebuild させる（updated_at は秒精度なので同秒の更新も確実に拾う）
+    try:
+        os.remove(_faiss_stamp_path())
+    except OSError:
+        pass
 
-    patents: List[Patent] = db.query(Patent).all()
+
+def _pq_subquantizers(dim: int) -> int:
+    # PQ の分割数は dim を割り切る必要がある
+    for m in range(min(_PQ_MAX_SUBQUANTIZERS, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _new_index(emb: np.ndarray) -> faiss.Index:
+    """
+    件数に応じて index を選ぶ（学習が必要なものはここで train まで済ませる）
+      - N >= _IVF_MIN_VECTORS: IVF{4·√N},PQ{M}x8 … 比較は nlist + nprobe·N/nlist 件、vector は M byte
+      - N >= _SQ_MIN_VECTORS: ScalarQuantizer QT_8bit（総当たり・vector は dim byte）
+      - それ未満: IndexFlatIP（総当たり）
+    """
+    n, dim = emb.shape
+    if n < _SQ_MIN_VECTORS:
+        return faiss.IndexFlatIP(dim)
+    if n < _IVF_MIN_VECTORS:
+        # 正規化済み埋め込みは [-1, 1] なので、値をそのまま int8 にする QT_8bit_direct_signed ではなく
+        # 次元ごとの範囲を学習する QT_8bit を使う
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(emb)
+        return index
+
+    nlist = max(32, int(4 * math.sqrt(n)))
+    index = faiss.index_factory(dim, f"IVF{nlist},PQ{_pq_subquantizers(dim)}x8", faiss.METRIC_INNER_PRODUCT)
+    index.train(emb)
+    _tune_index(index)
+    return index
+
+
+def _tune_index(index: faiss.Index) -> faiss.Index:
+    # nprobe は検索時パラメータなので、読み込み直後にも設定し直す
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = _IVF_NPROBE
+    return index
+
+
+def _build_faiss_from_db(db: Session) -> faiss.Index:
+    """patents を埋め込んで index を作る。IndexIDMap2 で包んで patent_id をそのまま FAISS の id にする"""
+    model = _get_model()
+
+    # 埋め込みに使う列だけ引く（fulltext 等は読まない・ORM オブジェクトも作らない）
+    cols = [Patent.id, Patent.publication_number, *[Patent.__table__.c[k] for k in _PATENT_TEXT_KEYS]]
+    patents = db.execute(select(*cols).order_by(Patent.id)).all()
     texts = [_patent_to_text(p) for p in patents]
 
     # 空を弾く（念のため）
-    keep: List[Tuple[Patent, str]] = [(p, t) for p, t in zip(patents, texts) if t]
+    keep: List[Tuple[Any, str]] = [(p, t) for p, t in zip(patents, texts) if t]
     patents = [p for p, _ in keep]
     texts = [t for _, t in keep]
 
     if not patents:
         # 空の index を返す
         dim = model.get_sentence_embedding_dimension()
-        index = faiss.IndexFlatIP(dim)
-        return index, []
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
 
     emb = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
     emb = np.asarray(emb, dtype="float32")
 
-    dim = emb.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(emb)
-
-    meta = [{"patent_id": p.id} for p in patents]
-    return index, meta
+    index = faiss.IndexIDMap2(_new_index(emb))
+    index.add_with_ids(emb, np.fromiter((p.id for p in patents), dtype=np.int64, count=len(patents)))
+    return index
 
 
-def _save_faiss(index: faiss.Index, meta: List[Dict[str, Any]]) -> None:
+def _save_faiss(index: faiss.Index, stamp: Dict[str, Any]) -> None:
     _ensure_faiss_dir()
-    faiss.write_index(index, _faiss_index_path())
-    with open(_faiss_meta_path(), "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    # mmap 中の index を上書きしないよう、別ファイルに書いてから置き換える（読み手は旧 inode を見続ける）
+    ip = _faiss_index_path()
+    tmp = f"{ip}.{os.getpid()}.{threading.get_ident()}.tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, ip)
+    # stamp は最後に書く（途中で落ちたら stamp 無し = 次回 rebuild）
+    with open(_faiss_stamp_path(), "w", encoding="utf-8") as f:
+        json.dump(stamp, f, ensure_ascii=False)
 
 
-def _get_or_build_faiss(db: Session, force_rebuild: bool = False) -> Tuple[faiss.Index, List[Dict[str, Any]]]:
+def _get_or_build_faiss(db: Session, force_rebuild: bool = False) -> faiss.Index:
+    stamp = _patents_stamp(db)
     if not force_rebuild:
-        loaded = _load_faiss_if_exists()
-        if loaded:
+        loaded = _load_faiss_if_exists(stamp)
+        if loaded is not None:
             return loaded
 
-    index, meta = _build_faiss_from_db(db)
-    _save_faiss(index, meta)
-    return index, meta
+    _invalidate_faiss()
+    index = _build_faiss_from_db(db)
+    _save_faiss(index, stamp)
+    return index
+
+
+# =========================
+# Query embedding cache（usage 文は run をまたいで同じものが繰り返し来る）
+#   メモリの LRU → data/faiss/query_cache/<key>.npy → encode の順に引く
+# =========================
+_QUERY_CACHE_MAX = 4096
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+def _query_cache_key(text: str) -> str:
+    # モデルが変われば別の埋め込みなので model 名（backend・量子化込み）もキーに入れる
+    return hashlib.blake2b(f"{_get_model_variant()}\x1f{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _query_cache_get(key: str) -> Optional[np.ndarray]:
+    with _query_cache_lock:
+        v = _query_cache.get(key)
+        if v is not None:
+            _query_cache.move_to_end(key)
+            return v
+    try:
+        v = np.load(os.path.join(_query_cache_dir(), f"{key}.npy"))
+    except (OSError, ValueError):
+        return None
+    _query_cache_put(key, v, persist=False)
+    return v
+
+
+def _query_cache_put(key: str, vec: np.ndarray, persist: bool = True) -> None:
+    with _query_cache_lock:
+        _query_cache[key] = vec
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > _QUERY_CACHE_MAX:
+            _query_cache.popitem(last=False)
+    if persist:
+        try:
+            d = _query_cache_dir()
+            os.makedirs(d, exist_ok=True)
+            # 書きかけのファイルを読まれないよう tmp に書いてから置き換える
+            tmp = os.path.join(d, f"{key}.{threading.get_ident()}.tmp.npy")
+            np.save(tmp, vec)
+            os.replace(tmp, os.path.join(d, f"{key}.npy"))
+        except OSError:
+            pass
+
+
+def _encode_queries(queries: List[str]) -> np.ndarray:
+    """query → 正規化済み埋め込み (M, dim)。キャッシュに無いものだけまとめて encode する"""
+    keys = [_query_cache_key(q) for q in queries]
+    vecs: List[Optional[np.ndarray]] = [_query_cache_get(k) for k in keys]
+
+    miss = [i for i, v in enumerate(vecs) if v is None]
+    if miss:
+        model = _get_model()
+        enc = model.encode([queries[i] for i in miss], batch_size=64, normalize_embeddings=True, show_progress_bar=False)
+        enc = np.asarray(enc, dtype="float32")
+        for i, v in zip(miss, enc):
+            vecs[i] = v
+            _query_cache_put(keys[i], v)
+
+    return np.vstack(vecs).astype("float32", copy=False)
+
+
+# encode はチャンク単位で 1 つ先行させる（torch の forward は GIL を離すので、
+# その間にメインスレッドで前のチャンクの search + INSERT を進められる）
+_ENCODE_CHUNK = 32
+_encode_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="patent-encode")
+
+
+def _iter_encoded_chunks(queries: List[str]) -> Iterator[Tuple[int, np.ndarray]]:
+    """queries を _ENCODE_CHUNK 件ずつ encode して (開始位置, 埋め込み) を返す"""
+    pending: "deque[Tuple[int, Any]]" = deque()
+    for start in range(0, len(queries), _ENCODE_CHUNK):
+        pending.append((start, _encode_pool.submit(_encode_queries, queries[start:start + _ENCODE_CHUNK])))
+        if len(pending) > 1:
+            s, fut = pending.popleft()
+            yield s, fut.result()
+    while pending:
+        s, fut = pending.popleft()
+        yield s, fut.result()
+
+
+def _search_index(index: faiss.Index, qv: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    index.search と同じ (D, I) を返す（I は patent_id）。
+    中身が IndexFlatIP（_SQ_MIN_VECTORS 未満の小さい corpus）なら FAISS を通さず numpy の行列積 1 回で済ませる
+    （件数が少ないと FAISS 側の呼び出し・結果ヒープの固定費の方が大きい）
+    """
+    inner = faiss.downcast_index(index.index)
+    if not isinstance(inner, faiss.IndexFlat) or inner.metric_type != faiss.METRIC_INNER_PRODUCT:
+        return index.search(qv, top_k)
+
+    emb = inner.reconstruct_n(0, inner.ntotal)
+    scores = qv @ emb.T
+    k = min(top_k, index.ntotal)
+    if k < index.ntotal:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(index.ntotal), (len(qv), k))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    I = faiss.vector_to_array(index.id_map)[np.take_along_axis(top, order, axis=1)]
+    D = np.take_along_axis(top_scores, order, axis=1)
+    if k < top_k:
+        # FAISS と同じく足りない分は -1 で埋める
+        pad = top_k - k
+        I = np.pad(I, ((0, 0), (0, pad)), constant_values=-1)
+        D = np.pad(D, ((0, 0), (0, pad)), constant_values=-np.inf)
+    return D, I
 
 
 def _search_patents_faiss(
     db: Session,
     index: faiss.Index,
-    meta: List[Dict[str, Any]],
-    query: str,
+    qv: np.ndarray,
     top_k: int,
-) -> List[Tuple[Patent, float]]:
-    query = (query or "").strip()
-    if not query or index.ntotal == 0:
-        return []
-
-    model = SentenceTransformer(_MODEL_NAME)
-    qv = model.encode([query], normalize_embeddings=True, show_progress_bar=False)
-    qv = np.asarray(qv, dtype="float32")
+) -> List[List[Tuple[int, float]]]:
+    """
+    encode 済みの query (M, dim) をまとめて index.search 1 回。
+    戻り値は query ごとの [(patent_id, score)]（DB に存在する patent だけ、score 順）
+    """
+    if len(qv) == 0 or index.ntotal == 0:
+        return [[] for _ in range(len(qv))]
 
-    D, I = index.search(qv, top_k)
-    scores = D[0].tolist()
-    ids = I[0].tolist()
+    D, I = _search_index(index, qv, top_k)
 
-    patent_ids: List[int] = []
-    scored: List[Tuple[int, float]] = []
-    for idx, score in zip(ids, scores):
-        if idx < 0 or idx >= len(meta):
-            continue
-        pid = int(meta[idx]["patent_id"])
-        patent_ids.append(pid)
-        scored.append((pid, float(score)))
+    # I はそのまま patent_id（-1 = 該当なし）
+    scored: List[List[Tuple[int, float]]] = [
+        [(pid, score) for pid, score in zip(pids, scores) if pid >= 0]
+        for pids, scores in zip(I.tolist(), D.tolist())
+    ]
 
+    patent_ids = set(I[I >= 0].tolist())
     if not patent_ids:
-        return []
+        return scored
 
-    # DBからまとめて引いて順番保持
-    rows = db.query(Patent).filter(Patent.id.in_(patent_ids)).all()
-    row_map = {r.id: r for r in rows}
-
-    out: List[Tuple[Patent, float]] = []
-    for pid, score in scored:
-        p = row_map.get(pid)
-        if p:
-            out.append((p, score))
-    return out
+    # index 作成後に消えた patent を落とす（存在確認は全 query 分まとめて 1 回）
+    existing = set(db.scalars(select(Patent.id).where(Patent.id.in_(patent_ids))))
+    return [[(pid, score) for pid, score in row if pid in existing] for row in scored]
 
 
 # =========================
@@ -289,14 +608,13 @@ def step_patent_retrieve(
         patent_count = db.query(Patent).count()
 
     # --- cleanup old rows for this run ---
-    db.query(PatentRetrieval).filter(PatentRetrieval.ai_run_id == run_id).delete(synchronize_session=False)
-    db.flush()
-
-    usages = (
-        db.query(UsageRequirement)
-        .filter(UsageRequirement.transaction_id == transaction_id)
-        .all()
-    )
+    db.execute(delete(PatentRetrieval).where(PatentRetrieval.ai_run_id == run_id))
+
+    usages = db.execute(
+        select(UsageRequirement.id, UsageRequirement.text)
+        .where(UsageRequirement.transaction_id == transaction_id)
+        .order_by(UsageRequirement.id)
+    ).all()
     if not usages:
         db.commit()
         return {"step": "patent_retrieve", "inserted": 0, "note": "usage_requirements が0件"}
@@ -305,31 +623,49 @@ def step_patent_retrieve(
 
     # FAISSをロード（なければDBから作って保存）
     force_rebuild = bool(params.get("force_rebuild_faiss", False))
-    index, meta = _get_or_build_faiss(db, force_rebuild=force_rebuild)
-
+    index = _get_or_build_faiss(db, force_rebuild=force_rebuild)
+
+    # 同じ文の usage は encode / search を 1 回だけにして、結果を各 usage に配る
+    usage_ids_by_text: Dict[str, List[int]] = {}
+    for usage_id, text in usages:
+        q = (text or "").strip()
+        if q:
+            usage_ids_by_text.setdefault(q, []).append(usage_id)
+
+    texts = list(usage_ids_by_text)
+    if index.ntotal > 0:
+        chunks: Any = _iter_encoded_chunks(texts)
+    else:
+        # 空 index なら encode せずに全件 fallback
+        chunks = [(0, np.empty((len(texts), 0), dtype="float32"))]
+
+    fallback: Optional[List[Tuple[int, float]]] = None
     inserted = 0
-    for u in usages:
-        q = (u.text or "").strip()
-        if not q:
-            continue
-
-        results = _search_patents_faiss(db, index, meta, q, top_k=top_k)
-
-        # fallback（FAISSが空等のとき）
-        if not results:
-            candidates = db.query(Patent).limit(top_k).all()
-            results = [(p, 0.0) for p in candidates]
-
-        for p, score in results:
-            pr = PatentRetrieval(
-                ai_run_id=run_id,
-                usage_requirement_id=u.id,
-                patent_id=p.id,
-                score=float(score),
-                why="faiss_embedding_search",
-            )
-            db.add(pr)
-            inserted += 1
+    for start, qv in chunks:
+        results_per_usage = _search_patents_faiss(db, index, qv, top_k=top_k)
+
+        pr_rows: List[Dict[str, Any]] = []
+        for q, results in zip(texts[start:start + len(qv)], results_per_usage):
+            # fallback（FAISSが空等のとき）
+            if not results:
+                if fallback is None:
+                    fallback = [(pid, 0.0) for pid in db.scalars(select(Patent.id).limit(top_k))]
+                results = fallback
+
+            for usage_id in usage_ids_by_text[q]:
+                for pid, score in results:
+                    pr_rows.append(
+                        {
+                            "ai_run_id": run_id,
+                            "usage_requirement_id": usage_id,
+                            "patent_id": pid,
+                            "score": float(score),
+                            "why": "faiss_embedding_search",
+                        }
+                    )
+
+        # チャンクごとに executemany 1 回（この間に次のチャンクの encode が進む）
+        inserted += bulk_insert_patent_retrievals(db, pr_rows)
 
     db.commit()
 
@@ -342,6 +678,5 @@ def step_patent_retrieve(
         "inserted": inserted,
         "patents_json_path": patents_json_path,
         "faiss_index_path": _faiss_index_path(),
-        "faiss_meta_path": _faiss_meta_path(),
         "note": "patents(DB) -> FAISS index -> retrieve topK by embedding similarity",
     }
@@ -3,14 +3,23 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Optional, Dict, Any, List, Tuple
+from functools import lru_cache
+from itertools import islice
+from typing import Collection, Iterable, Optional, Dict, Any, List, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+try:
+    import orjson
+except ImportError:  # orjson は任意（無ければ標準 json）
+    orjson = None  # type: ignore[assignment]
 
-from app.db.models.ai_run import AiRun, RunType, MatrixMatch
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import case, desc, func, or_, select
+
+from app.db.enums import RunType, UsageSource
+from app.db.loading import strict
+from app.db.models.ai_run import AiRun, MatrixMatch
 from app.db.models.matrix import MatrixRule
-from app.db.models.transaction import UsageRequirement, UsageSource
+from app.db.models.transaction import UsageRequirement
 
 
 # -----------------------------
@@ -34,43 +43,86 @@ def _pick_latest_matrix_match_run_id(db: Session, transaction_id: int) -> int:
 
 
 def _get_item_key(rule: MatrixRule) -> str:
-    v = getattr(rule, "version", None) or ""
+    v = rule.version or ""
     # item_no がJSON風文字列でも、そのままキーにする（同一ルール集約が目的）
     return f"{rule.regime}::{rule.item_no}::{v}"
 
 
-def _safe_json_loads(s: Optional[str]) -> Optional[Dict[str, Any]]:
+def _safe_json_loads(s: Any) -> Optional[Dict[str, Any]]:
     if not s:
         return None
+    # evidence_json は JSON 型なので通常は dict で来る（engine の json_deserializer = orjson でパース済み）
+    # 旧データの文字列だけここでパースする
+    if isinstance(s, dict):
+        return s
     try:
-        return json.loads(s)
+        v = orjson.loads(s) if orjson is not None else json.loads(s)
     except Exception:
         return None
+    return v if isinstance(v, dict) else None
+
 
+# item がどちら側に hit を持つか（ビット和）
+_SIDE_CORE = 1
+_SIDE_EXPANDED = 2
 
-def _load_matches(db: Session, run_id: int) -> List[Tuple[MatrixMatch, MatrixRule]]:
-    return (
-        db.query(MatrixMatch, MatrixRule)
+
+def _load_rule_sides(db: Session, run_id: int) -> List[Tuple[int, str, str, Optional[str], int]]:
+    """
+    rule ごとに core / expanded どちら側の hit があるかを SQL の GROUP BY で集計する
+    （(rule_id, regime, item_no, version, _SIDE_* のビット和)。分類条件は compute_two_lists のループと同じ）
+    """
+    is_core = or_(
+        func.lower(MatrixMatch.match_type) == "core_hit",
+        UsageRequirement.source == UsageSource.core.value,
+    )
+    stmt = (
+        select(
+            MatrixRule.id,
+            MatrixRule.regime,
+            MatrixRule.item_no,
+            MatrixRule.version,
+            func.max(case((is_core, _SIDE_CORE), else_=0)),
+            func.max(case((is_core, 0), else_=_SIDE_EXPANDED)),
+        )
+        .select_from(MatrixMatch)
         .join(MatrixRule, MatrixRule.id == MatrixMatch.matrix_rule_id)
-        .filter(MatrixMatch.ai_run_id == run_id)
-        .all()
+        .outerjoin(UsageRequirement, UsageRequirement.id == MatrixMatch.usage_requirement_id)
+        .where(MatrixMatch.ai_run_id == run_id)
+        .group_by(MatrixRule.id, MatrixRule.regime, MatrixRule.item_no, MatrixRule.version)
     )
+    return [(rid, regime, item_no, version, core | exp) for rid, regime, item_no, version, core, exp in db.execute(stmt)]
 
 
-def _load_usage_map(db: Session, transaction_id: int) -> Dict[int, UsageRequirement]:
-    urs = (
-        db.query(UsageRequirement)
-        .filter(UsageRequirement.transaction_id == transaction_id)
-        .all()
+def _load_matches(
+    db: Session,
+    run_id: int,
+    rule_ids: Optional[Collection[int]] = None,
+) -> Iterable[Tuple[MatrixMatch, MatrixRule, Optional[str], Optional[str]]]:
+    """
+    (match, rule, usage の source, usage の text) を 1 クエリで引く。
+    usage は 2 列しか使わないので ORM オブジェクトにせず列で取る（usage_map 用の 2 本目のクエリをやめた）
+    rule_ids を渡したらその rule の match だけ（表示しない item の hit は組み立てない）
+    結果は 1 回だけ順に読むので .all() にせず yield_per で流す（大きい run でも全 ORM 行を同時に抱えない）
+    """
+    q = (
+        db.query(MatrixMatch, MatrixRule, UsageRequirement.source, UsageRequirement.text)
+        .join(MatrixRule, MatrixRule.id == MatrixMatch.matrix_rule_id)
+        .outerjoin(UsageRequirement, UsageRequirement.id == MatrixMatch.usage_requirement_id)
+        .filter(MatrixMatch.ai_run_id == run_id)
     )
-    return {u.id: u for u in urs}
+    if rule_ids is not None:
+        q = q.filter(MatrixMatch.matrix_rule_id.in_(rule_ids))
+    # ix_matrix_matches_run_rule の順（rule ごと・登録順）に固定する
+    q = q.order_by(MatrixMatch.matrix_rule_id, MatrixMatch.id)
+    return strict(q, undefer(MatrixMatch.evidence_json), undefer(MatrixRule.requirement_text)).yield_per(1000)
 
 
 # -----------------------------
 # Display helpers (compact UI)
 # -----------------------------
-_ID_RE_1 = re.compile(r"'id'\s*:\s*'([^']+)'")
-_ID_RE_2 = re.compile(r'"id"\s*:\s*"([^"]+)"')
+# 'id': '...' と "id": "..." を 1 回の走査で拾う（引用符は前後で揃っているものだけ）
+_ID_RE = re.compile(r"'id'\s*:\s*'([^']+)'" r'|"id"\s*:\s*"([^"]+)"')
 
 
 def _extract_item_ids(item_no: Optional[str]) -> List[str]:
@@ -81,36 +133,34 @@ def _extract_item_ids(item_no: Optional[str]) -> List[str]:
 
     ここから id だけ抜いて UI表示を簡潔にする。
     """
-    if not item_no:
+    # "id" を含まない item_no（多数派）は regex も cache も通さない
+    if not item_no or "id" not in item_no:
         return []
-    ids = _ID_RE_1.findall(item_no)
-    if not ids:
-        ids = _ID_RE_2.findall(item_no)
-    # 去重しつつ順序保持
-    seen = set()
-    out: List[str] = []
-    for x in ids:
-        if x and x not in seen:
-            seen.add(x)
-            out.append(x)
-    return out
+    return list(_item_ids(item_no))
+
+
+@lru_cache(maxsize=4096)
+def _item_ids(item_no: str) -> Tuple[str, ...]:
+    # 同じ rule（item_no）は多数の match に出てくるので結果を使い回す。去重しつつ順序保持
+    ids = (single or double for single, double in _ID_RE.findall(item_no))
+    return tuple(dict.fromkeys(x for x in ids if x))
 
 
 def _compact_item_label(rule: MatrixRule) -> str:
-    ids = _extract_item_ids(getattr(rule, "item_no", None))
+    ids = _extract_item_ids(rule.item_no)
     if ids:
         return " / ".join(ids)
     # fallback: 長いので頭だけ
-    s = (getattr(rule, "item_no", "") or "").strip()
+    s = (rule.item_no or "").strip()
     return s[:80] + ("…" if len(s) > 80 else "")
 
 
 # 軽いストップワード（2-3gramベースの matched_tokens に混ざりやすいもの）
-_STOP = {
-    "する", "して", "した", "として", "ため", "用途", "用い", "用い", "用の", "用い",
-    "に用", "に用い", "用いる", "いる", "に用", "に用い", "に用いる",
+_STOP = frozenset({
+    "する", "して", "した", "として", "ため", "用途", "用い", "用の",
+    "に用", "に用い", "用いる", "いる", "に用いる",
     "工程", "使用", "用", "に", "の", "は", "を", "と",
-}
+})
 
 
 def _compact_matched_tokens(evidence: Optional[Dict[str, Any]], limit: int = 8) -> List[str]:
@@ -122,42 +172,36 @@ def _compact_matched_tokens(evidence: Optional[Dict[str, Any]], limit: int = 8)
     toks = evidence.get("matched_tokens") or []
     if not isinstance(toks, list):
         return []
-    cleaned: List[str] = []
-    seen = set()
-    for t in toks:
-        if not isinstance(t, str):
-            continue
-        tt = t.strip()
-        if not tt:
-            continue
-        # 1文字はノイズになりがち（2gram/3gram前提なので基本2以上だが念のため）
-        if len(tt) <= 1:
-            continue
-        if tt in _STOP:
-            continue
-        if tt in seen:
-            continue
-        seen.add(tt)
-        cleaned.append(tt)
-        if len(cleaned) >= limit:
-            break
-    return cleaned
-
-
-def compute_two_lists(db: Session, transaction_id: int, run_id: Optional[int] = None) -> Dict[str, Any]:
+    # 去重（dict.fromkeys = 順序保持）→ 除外 → 先頭 limit 件。判定は値だけで決まるので去重が先でも結果は同じ
+    # 1文字はノイズになりがち（2gram/3gram前提なので基本2以上だが念のため）
+    uniq = dict.fromkeys(t.strip() for t in toks if isinstance(t, str))
+    return list(islice((tt for tt in uniq if len(tt) > 1 and tt not in _STOP), limit))
+
+
+# best_decision の優先順位: hit > maybe > その他（ループ内では bound method を 1 回呼ぶだけ）
+_decision_rank = {"hit": 2, "maybe": 1}.get
+
+
+def compute_two_lists(
+    db: Session,
+    transaction_id: int,
+    run_id: Optional[int] = None,
+    include_evidence: bool = True,
+) -> Dict[str, Any]:
     """
     2リスト集計（UI向け compact 表示フィールド付き）:
       - core_hit と expanded_hit を item_no 単位で集約
       - A: 両方に出る item（intersection）
       - B: expanded のみに出る item（expanded_only）
+    include_evidence=False なら hit ごとの evidence（元 JSON）は返さない（matched_compact / threshold だけ）
     """
     rid = run_id or _pick_latest_matrix_match_run_id(db, transaction_id)
 
-    rows = _load_matches(db, rid)
-    usage_map = _load_usage_map(db, transaction_id)
+    # item（regime + item_no + version）単位の振り分けを先に SQL の集計で決める
+    rule_sides = _load_rule_sides(db, rid)
 
     # 0件なら例外を投げずに空で返す
-    if not rows:
+    if not rule_sides:
         return {
             "transaction_id": transaction_id,
             "run_id": rid,
@@ -171,55 +215,80 @@ def compute_two_lists(db: Session, transaction_id: int, run_id: Optional[int] =
             "note": "このrun_idでは matrix_matches が0件でした（用途要件とマトリクスの語彙が一致しない等）。",
         }
 
-    grouped: Dict[str, Dict[str, Any]] = {}
-
-    for mm, rule in rows:
-        key = _get_item_key(rule)
-        g = grouped.setdefault(
-            key,
-            {
-                "key": key,
-                "regime": rule.regime,
-                "rule_id": rule.id,
-                "version": getattr(rule, "version", None),
-
-                # --- compact UI fields ---
-                "item_ids": _extract_item_ids(getattr(rule, "item_no", None)),
-                "item_label": _compact_item_label(rule),
-                "rule_summary": (getattr(rule, "requirement_text", "") or "").strip()[:160],
-
-                "title": getattr(rule, "title", None),
-                "hits": {"core": [], "expanded": []},
-                "max_score": None,
-                "best_decision": None,   # hit/maybe/...
-            },
-        )
-
-        ur = usage_map.get(mm.usage_requirement_id) if getattr(mm, "usage_requirement_id", None) else None
-        ur_source = ur.source if ur else None
-        ur_text = ur.text if ur else None
+    item_sides: Dict[str, int] = {}
+    rule_keys: Dict[int, str] = {}
+    for rule_id, regime, item_no, version, side in rule_sides:
+        key = f"{regime}::{item_no}::{version or ''}"  # _get_item_key と同じ
+        rule_keys[rule_id] = key
+        item_sides[key] = item_sides.get(key, 0) | side
+
+    # 表示するのは expanded 側に hit がある item（A / B）だけ。core だけの item の hit は引かない
+    shown_rule_ids = [rid_ for rid_, key in rule_keys.items() if item_sides[key] & _SIDE_EXPANDED]
+    rows: Iterable[Tuple[MatrixMatch, MatrixRule, Optional[str], Optional[str]]] = []
+    if len(shown_rule_ids) == len(rule_keys):
+        rows = _load_matches(db, rid)
+    elif shown_rule_ids:
+        rows = _load_matches(db, rid, shown_rule_ids)
+
+    # threshold は run の params から 1 回だけ引く（evidence_json の scoring は旧 run にしか無い）
+    run_params = db.scalar(select(AiRun.params).where(AiRun.id == rid)) or {}
+    run_threshold = run_params.get("threshold")
 
-        evidence = _safe_json_loads(getattr(mm, "evidence_json", None))
+    grouped: Dict[str, Dict[str, Any]] = {}
+    # 同じ rule は多数の match に出るので、rule.id → group を覚えておき key / 表示用フィールドの計算は初回だけ
+    group_by_rule: Dict[int, Dict[str, Any]] = {}
+    core_source = UsageSource.core.value
+
+    for mm, rule, ur_source, ur_text in rows:
+        g = group_by_rule.get(rule.id)
+        if g is None:
+            key = _get_item_key(rule)
+            g = grouped.get(key)
+            if g is None:
+                g = grouped[key] = {
+                    "key": key,
+                    "regime": rule.regime,
+                    "rule_id": rule.id,
+                    "version": rule.version,
+
+                    # --- compact UI fields ---
+                    "item_ids": _extract_item_ids(rule.item_no),
+                    "item_label": _compact_item_label(rule),
+                    "rule_summary": (rule.requirement_text or "").strip()[:160],
+
+                    "title": rule.title,
+                    "hits": {"core": [], "expanded": []},
+                    "max_score": None,
+                    "best_decision": None,   # hit/maybe/...
+                }
+            group_by_rule[rule.id] = g
+
+        evidence = _safe_json_loads(mm.evidence_json)
         matched_compact = _compact_matched_tokens(evidence, limit=8)
 
-        decision = getattr(mm, "decision", None)  # NOT NULLの想定
+        decision = mm.decision  # NOT NULLの想定
+        match_type = mm.match_type
+        score = float(mm.match_score or 0.0)
 
         hit_record = {
             "matrix_match_id": mm.id,
-            "usage_requirement_id": getattr(mm, "usage_requirement_id", None),
+            "usage_requirement_id": mm.usage_requirement_id,
             "usage_source": ur_source,
             "usage_text": (ur_text or "").strip(),
-            "match_score": float(getattr(mm, "match_score", 0.0) or 0.0),
-            "match_type": getattr(mm, "match_type", None),
+            "match_score": score,
+            "match_type": match_type,
             "decision": decision,
 
             # compact reason
             "matched_compact": matched_compact,
-            "threshold": (evidence or {}).get("scoring", {}).get("threshold"),
-            "evidence": evidence,
+            "threshold": (
+                run_threshold if run_threshold is not None
+                else (evidence or {}).get("scoring", {}).get("threshold")
+            ),
         }
+        if include_evidence:
+            hit_record["evidence"] = evidence
 
-        score = hit_record["match_score"]
         if g["max_score"] is None or score > g["max_score"]:
             g["max_score"] = score
 
@@ -227,31 +296,19 @@ def compute_two_lists(db: Session, transaction_id: int, run_id: Optional[int] =
         if decision:
             if g["best_decision"] is None:
                 g["best_decision"] = decision
-            else:
-                # 優先順位: hit > maybe > その他
-                pr = {"hit": 2, "maybe": 1}
-                if pr.get(decision, 0) > pr.get(g["best_decision"], 0):
-                    g["best_decision"] = decision
-
-        mt = (hit_record["match_type"] or "").lower()
-        if mt == "core_hit" or (ur and ur.source == UsageSource.core.value):
+            elif _decision_rank(decision, 0) > _decision_rank(g["best_decision"], 0):
+                g["best_decision"] = decision
+
+        if (match_type or "").lower() == "core_hit" or ur_source == core_source:
             g["hits"]["core"].append(hit_record)
-        elif mt == "expanded_hit" or (ur and ur.source in (UsageSource.expanded.value, UsageSource.analyst_added.value)):
-            g["hits"]["expanded"].append(hit_record)
         else:
-            # 不明なら expanded 側へ
+            # expanded_hit / expanded・analyst_added 由来、不明なものも expanded 側へ
             g["hits"]["expanded"].append(hit_record)
 
-    intersection: List[Dict[str, Any]] = []
-    expanded_only: List[Dict[str, Any]] = []
-
-    for item in grouped.values():
-        has_core = len(item["hits"]["core"]) > 0
-        has_exp = len(item["hits"]["expanded"]) > 0
-        if has_core and has_exp:
-            intersection.append(item)
-        elif (not has_core) and has_exp:
-            expanded_only.append(item)
+    # A: 両側に hit / B: expanded 側だけ（core だけの item は grouped に入っていない）
+    both = _SIDE_CORE | _SIDE_EXPANDED
+    intersection = [g for k, g in grouped.items() if item_sides[k] == both]
+    expanded_only = [g for k, g in grouped.items() if item_sides[k] == _SIDE_EXPANDED]
 
     def sort_key(x: Dict[str, Any]):
         score = x["max_score"]
@@ -268,7 +325,7 @@ def compute_two_lists(db: Session, transaction_id: int, run_id: Optional[int] =
         "counts": {
             "intersection": len(intersection),
             "expanded_only": len(expanded_only),
-            "total_unique_items": len(grouped),
+            "total_unique_items": len(item_sides),
         },
         "intersection": intersection,
         "expanded_only": expanded_only,
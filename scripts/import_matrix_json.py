@@ -5,9 +5,13 @@ import argparse
 import json
 import os
 import sys
-from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson は任意（無ければ標準 json）
+    orjson = None  # type: ignore[assignment]
 
 # ---------------------------------------------------------
 # ✅ 先に import path を通す（これが重要）
@@ -16,7 +20,9 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from app.db.session import SessionLocal  # noqa: E402
+from sqlalchemy import delete, insert, select, update  # noqa: E402
+
+from app.db.session import batch_session  # noqa: E402
 from app.db.models.matrix import MatrixRule  # noqa: E402
 
 
@@ -30,8 +36,11 @@ def _s(x: Any) -> str:
 
 
 def _first_nonempty(*vals: Any) -> str:
+    # 先頭で決まることが多いので、_s() を挟まずに最初の非空で返す
     for v in vals:
-        s = _s(v)
+        if v is None:
+            continue
+        s = (v if isinstance(v, str) else str(v)).strip()
         if s:
             return s
     return ""
@@ -273,20 +282,38 @@ def _detect_and_iter_rules(data: Any) -> Iterable[Dict[str, Any]]:
     yield from _iter_rules_from_normalized(data)
 
 
+_RULE_COLUMNS = (
+    "regime", "list_name", "item_no", "title", "requirement_text",
+    "usage_criteria_text", "tech_criteria_text", "notes", "version", "effective_date",
+)
+
+
+def _load_json(json_path: Path) -> Any:
+    # bytes のまま渡す（str へのデコードを挟まない）
+    raw = json_path.read_bytes()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except ValueError:
+            pass  # NaN / 64bit 超の int など orjson が受け付けないものは標準 json に任せる
+    return json.loads(raw)
+
+
 def import_matrix(json_path: Path, purge: bool = False) -> int:
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+    data = _load_json(json_path)
 
     raw_rules = list(_detect_and_iter_rules(data))
     if not raw_rules:
         raise ValueError("JSONからルールが1件も取れませんでした。")
 
-    db = SessionLocal()
+    db = batch_session()
     try:
         if purge:
-            db.query(MatrixRule).delete()
+            db.execute(delete(MatrixRule))
             db.commit()
 
-        n = 0
+        # (regime, item_no, version) → 行。同じキーが JSON 内で重複したら後勝ち
+        rules: Dict[Tuple[str, str, Optional[str]], Dict[str, Any]] = {}
         for raw in raw_rules:
             # fx_matrix 形式はすでに整形済み、normalized は coerce
             if "requirement_text" in raw and "item_no" in raw and "regime" in raw:
@@ -294,42 +321,30 @@ def import_matrix(json_path: Path, purge: bool = False) -> int:
             else:
                 rule = _coerce_rule(raw)
 
-            # upsert: regime + item_no + version（versionが無い運用でもOK）
-            q = db.query(MatrixRule).filter(
-                MatrixRule.regime == rule["regime"],
-                MatrixRule.item_no == rule["item_no"],
-            )
-            if hasattr(MatrixRule, "version"):
-                q = q.filter(MatrixRule.version == rule.get("version"))
-
-            obj = q.first()
-            if not obj:
-                obj = MatrixRule(
-                    regime=rule["regime"],
-                    item_no=rule["item_no"],
-                    version=rule.get("version"),
+            row = {c: rule.get(c) for c in _RULE_COLUMNS}
+            row["title"] = rule.get("title") or ""
+            row["requirement_text"] = rule.get("requirement_text") or "N/A"  # ✅ NOT NULL 対策
+            rules[(row["regime"], row["item_no"], row["version"])] = row
+
+        # upsert: regime + item_no + version（versionが無い運用でもOK）
+        # version は NULL が多く UNIQUE 制約の ON CONFLICT では拾えないので、既存キーを 1 クエリで引いて振り分ける
+        existing = {
+            (regime, item_no, version): rule_id
+            for rule_id, regime, item_no, version in db.execute(
+                select(MatrixRule.id, MatrixRule.regime, MatrixRule.item_no, MatrixRule.version).where(
+                    MatrixRule.regime.in_({k[0] for k in rules})
                 )
-
-            # columns
-            if hasattr(obj, "list_name"):
-                obj.list_name = rule.get("list_name")
-            obj.title = rule.get("title") or ""
-            obj.requirement_text = rule.get("requirement_text") or "N/A"  # ✅ NOT NULL 対策
-            if hasattr(obj, "usage_criteria_text"):
-                obj.usage_criteria_text = rule.get("usage_criteria_text")
-            if hasattr(obj, "tech_criteria_text"):
-                obj.tech_criteria_text = rule.get("tech_criteria_text")
-            if hasattr(obj, "notes"):
-                obj.notes = rule.get("notes")
-            if hasattr(obj, "effective_date"):
-                obj.effective_date = rule.get("effective_date")
-
-            # timestamps（モデル側で自動なら無視されてもOK）
-            if hasattr(obj, "updated_at"):
-                obj.updated_at = datetime.utcnow()
-
-            db.add(obj)
-            n += 1
+            )
+        }
+        inserts = [row for key, row in rules.items() if key not in existing]
+        updates = [{**row, "id": existing[key]} for key, row in rules.items() if key in existing]
+
+        # executemany 1 回ずつ（updated_at は UPDATE 文の中で func.now()（モデルの onupdate））
+        if inserts:
+            db.execute(insert(MatrixRule), inserts)
+        if updates:
+            db.execute(update(MatrixRule), updates)
+        n = len(raw_rules)
 
         db.commit()
         return n
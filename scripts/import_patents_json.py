@@ -1,13 +1,27 @@
 from __future__ import annotations
 
 import json
+import mmap
 import os
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
+try:
+    import ijson
+except ImportError:  # ijson は任意（無ければ全体を読んでから回す）
+    ijson = None  # type: ignore[assignment]
+
+try:
+    import orjson
+except ImportError:  # orjson は任意（無ければ標準 json）
+    orjson = None  # type: ignore[assignment]
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from app.db.session import SessionLocal
+from app.db.session import batch_session
 from app.db.models.patent import Patent, PatentUsecase
 
 
@@ -19,96 +33,262 @@ def project_root() -> str:
     return os.path.abspath(os.path.join(here, ".."))
 
 
-def read_json(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        doc = json.load(f)
+def _load_file(f: BinaryIO) -> Any:
+    # orjson は memoryview をそのまま読めるので、mmap してファイル全体の bytes コピーを作らない
+    if orjson is not None and os.fstat(f.fileno()).st_size > 0:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as buf:
+                return orjson.loads(buf)
+        except ValueError:
+            pass  # NaN / 64bit 超の int など orjson が受け付けないものは標準 json に任せる
+    f.seek(0)
+    return json.loads(f.read())
 
-    if isinstance(doc, list):
-        return doc
-    if isinstance(doc, dict) and isinstance(doc.get("items"), list):
-        return doc["items"]
 
-    raise ValueError("patents.json must be list or { items: [...] }")
+def iter_items(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    patents.json（list / { items: [...] }）の要素を 1 件ずつ返す。
+    ijson があればファイル全体を読み込まずにストリームで読む（無ければ全体を orjson / json で読む）
+    """
+    with open(path, "rb") as f:
+        head = f.read(4096).lstrip()
+        f.seek(0)
+        if ijson is not None and head[:1] in (b"[", b"{"):
+            prefix = "item" if head[:1] == b"[" else "items.item"
+            # quality_score を Decimal ではなく float で受ける（SQLite の Float 列に Decimal は渡せない）
+            for it in ijson.items(f, prefix, use_float=True):
+                if isinstance(it, dict):
+                    yield it
+            return
+        doc = _load_file(f)
+
+    if isinstance(doc, list):
+        items = doc
+    elif isinstance(doc, dict) and isinstance(doc.get("items"), list):
+        items = doc["items"]
+    else:
+        raise ValueError("patents.json must be list or { items: [...] }")
+    for it in items:
+        if isinstance(it, dict):
+            yield it
 
 
 def to_ipc_raw(v: Any) -> Optional[str]:
     if not v:
         return None
     if isinstance(v, list):
-        return ";".join([str(x).strip() for x in v if str(x).strip()])
+        # 要素はほぼ str なので str() は str 以外のときだけ。strip も 1 要素 1 回
+        return ";".join(s for s in (x.strip() if isinstance(x, str) else str(x).strip() for x in v) if s)
     return str(v).strip()
 
 
 # ------------------------
 # upsert logic
 # ------------------------
-def upsert_patents(db: Session, items: List[Dict[str, Any]]) -> Dict[str, int]:
-    inserted = 0
-    updated = 0
-    usecase_inserted = 0
-    now = datetime.utcnow()
+# publication_number IN (...) 1 回あたりの件数（SQLite の変数上限より十分小さく）
+_IN_CHUNK = 1000
+# 何件ごとに INSERT / UPDATE するか（ストリームで読みながらこの件数ずつ書く）
+_CHUNK = 500
+
+
+def _load_patent_ids(db: Session, pubs: List[str]) -> Dict[str, int]:
+    """publication_number → id を _IN_CHUNK 件ずつの IN クエリで引く"""
+    ids: Dict[str, int] = {}
+    for i in range(0, len(pubs), _IN_CHUNK):
+        rows_in_db = db.execute(
+            select(Patent.publication_number, Patent.id).where(
+                Patent.publication_number.in_(pubs[i:i + _IN_CHUNK])
+            )
+        )
+        ids.update((pub, pid) for pub, pid in rows_in_db)
+    return ids
+
+
+# 再 import で上書きする列（publication_number / ingested_at / created_at は触らない）
+_UPDATE_KEYS = ("title", "assignee", "abstract", "fulltext", "ipc_codes_raw")
+
+
+def _on_conflict_upsert(db: Session) -> Optional[Any]:
+    """
+    publication_number の UNIQUE で INSERT ... ON CONFLICT DO UPDATE ... RETURNING する文（PG / SQLite のみ）。
+    それ以外の dialect は None（既存判定 + INSERT / UPDATE に戻す）
+    """
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        stmt = pg_insert(Patent)
+    elif name == "sqlite":
+        stmt = sqlite_insert(Patent)
+    else:
+        return None
+    # ON CONFLICT の UPDATE にはモデルの onupdate が載らないので updated_at は明示する
+    set_ = {k: stmt.excluded[k] for k in _UPDATE_KEYS}
+    set_["updated_at"] = func.now()
+    # 内容が変わっていない行は UPDATE しない（再 import で全行書き直し・updated_at の更新をしない）
+    changed = or_(*(Patent.__table__.c[k].is_distinct_from(stmt.excluded[k]) for k in _UPDATE_KEYS))
+    return stmt.on_conflict_do_update(
+        index_elements=[Patent.publication_number], set_=set_, where=changed
+    ).returning(Patent.publication_number, Patent.id)
+
+
+_USECASE_COLUMNS = ("patent_id", "usecase_text", "normalized_usecase_text", "extraction_method", "quality_score")
+
+
+def _copy_usecases(db: Session, rows: List[Dict[str, Any]]) -> bool:
+    """
+    Postgres + psycopg 3 のときは COPY ... FROM STDIN で入れる（INSERT 文の解析・計画を挟まない）。
+    それ以外（SQLite / psycopg2 等）は False を返し、呼び出し側が executemany で入れる。
+    created_at / updated_at は列に挙げないので COPY でも server_default が入る
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    # Session と同じ接続（= 同じトランザクション）の DBAPI cursor
+    cur = db.connection().connection.dbapi_connection.cursor()
+    with cur:
+        if not hasattr(cur, "copy"):
+            return False
+        sql = f"COPY {PatentUsecase.__tablename__} ({', '.join(_USECASE_COLUMNS)}) FROM STDIN"
+        with cur.copy(sql) as cp:
+            for row in rows:
+                cp.write_row(tuple(row[c] for c in _USECASE_COLUMNS))
+    return True
+
+
+def _upsert_chunk(
+    db: Session,
+    rows: Dict[str, Dict[str, Any]],
+    pending_usecases: List[Tuple[str, Dict[str, Any]]],
+) -> Tuple[int, int]:
+    """publication_number → row の 1 チャンク分を INSERT / UPDATE し、その usecases を入れる"""
+    if not rows:
+        return 0, 0
+
+    stmt = _on_conflict_upsert(db)
+    if stmt is not None:
+        # 新規 / 既存の振り分けは DB に任せる。件数の内訳は upsert 前の max(id) より大きい id を新規とみなす
+        max_id = db.scalar(select(func.max(Patent.id))) or 0
+        patent_ids = {pub: pid for pub, pid in db.execute(stmt, list(rows.values()))}
+        inserted = sum(1 for pid in patent_ids.values() if pid > max_id)
+        updated = len(patent_ids) - inserted
+        # 内容が同じで UPDATE を飛ばした行は RETURNING に出てこないので、usecases 用に id だけ引く
+        unchanged = [pub for pub in rows if pub not in patent_ids]
+        if unchanged:
+            patent_ids.update(_load_patent_ids(db, unchanged))
+    else:
+        existing = _load_patent_ids(db, list(rows))
+        inserts = [row for pub, row in rows.items() if pub not in existing]
+        updates = [{**row, "id": existing[pub]} for pub, row in rows.items() if pub in existing]
+
+        if inserts:
+            db.execute(insert(Patent), inserts)
+        if updates:
+            # 主キー付き dict のリスト → ORM の bulk UPDATE（executemany）
+            db.execute(update(Patent), updates)
+
+        # 新規分の id を 1 回で引き直す（行ごとの flush をしない）
+        patent_ids = {**existing, **_load_patent_ids(db, [row["publication_number"] for row in inserts])}
+        inserted, updated = len(inserts), len(updates)
+
+    # usecases も ORM の add() を積まず 1 回で入れる（id は使わないので RETURNING しない）
+    if pending_usecases:
+        uc_rows = [{"patent_id": patent_ids[pub], **uc} for pub, uc in pending_usecases]
+        if not _copy_usecases(db, uc_rows):
+            db.execute(insert(PatentUsecase), uc_rows)
+    return inserted, updated
+
+
+_Chunk = Tuple[Dict[str, Dict[str, Any]], List[Tuple[str, Dict[str, Any]]], int]
+
+
+def _iter_chunks(items: Iterable[Dict[str, Any]]) -> Iterator[_Chunk]:
+    """
+    items を (publication_number → row, (pub, usecase) のリスト, 読んだ件数) に _CHUNK 件ずつまとめる。
+    最後に端数（空でも）を 1 回返す
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    pending_usecases: List[Tuple[str, Dict[str, Any]]] = []
+    n = 0
 
     for it in items:
+        n += 1
         pub = (it.get("publication_number") or "").strip()
         if not pub:
             continue
 
-        title = (it.get("title") or "").strip()
-        assignee = (it.get("assignee") or it.get("applicant") or "").strip()
-        abstract = (it.get("abstract") or "").strip()
-        fulltext = (it.get("fulltext") or "").strip()
-        ipc_raw = to_ipc_raw(it.get("ipc_codes"))
-
-        obj = db.query(Patent).filter(Patent.publication_number == pub).first()
-
-        if obj:
-            obj.title = title
-            obj.assignee = assignee
-            obj.abstract = abstract
-            obj.fulltext = fulltext
-            obj.ipc_codes_raw = ipc_raw
-            obj.updated_at = now
-            updated += 1
-        else:
-            obj = Patent(
-                publication_number=pub,
-                title=title,
-                assignee=assignee,
-                abstract=abstract,
-                fulltext=fulltext,
-                ipc_codes_raw=ipc_raw,
-                ingested_at=now,
-                created_at=now,
-                updated_at=now,
-            )
-            db.add(obj)
-            db.flush()  # ← id を即時確定
-            inserted += 1
+        rows[pub] = {
+            "publication_number": pub,
+            "title": (it.get("title") or "").strip(),
+            "assignee": (it.get("assignee") or it.get("applicant") or "").strip(),
+            "abstract": (it.get("abstract") or "").strip(),
+            "fulltext": (it.get("fulltext") or "").strip(),
+            "ipc_codes_raw": to_ipc_raw(it.get("ipc_codes")),
+        }
 
-        # ---- usecases（evidence 用） ----
+        # ---- usecases（evidence 用）：patent_id は INSERT 後に引き直すので pub で持っておく ----
         usecases = it.get("usecases") or []
         for uc in usecases:
             txt = (uc.get("text") or "").strip()
             if not txt:
                 continue
+            pending_usecases.append((pub, {
+                "usecase_text": txt,
+                "normalized_usecase_text": (uc.get("normalized") or None),
+                "extraction_method": uc.get("method") or "json",
+                "quality_score": uc.get("quality_score"),
+            }))
 
-            pu = PatentUsecase(
-                patent_id=obj.id,
-                usecase_text=txt,
-                normalized_usecase_text=(uc.get("normalized") or None),
-                extraction_method=uc.get("method") or "json",
-                quality_score=uc.get("quality_score"),
-                created_at=now,
-                updated_at=now,
-            )
-            db.add(pu)
-            usecase_inserted += 1
+        if len(rows) >= _CHUNK:
+            yield rows, pending_usecases, n
+            rows, pending_usecases, n = {}, [], 0
+
+    yield rows, pending_usecases, n
+
+
+# 次チャンクの読み込み（JSON パース + 整形）を DB 書き込みと重ねるための 1 スレッド
+# （DB ドライバは実行中 GIL を離すので、書いている間に次を読める）
+_read_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="patents-json")
+
+
+def _prefetch(chunks: Iterator[_Chunk]) -> Iterator[_Chunk]:
+    """chunks の次の要素を _read_pool で 1 つ先読みしながら返す（chunks を進めるのは常に _read_pool 側）"""
+    fut = _read_pool.submit(next, chunks, None)
+    while True:
+        chunk = fut.result()
+        if chunk is None:
+            return
+        fut = _read_pool.submit(next, chunks, None)
+        yield chunk
+
+
+def upsert_patents(db: Session, items: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    patents.json の items → patents / patent_usecases
+      - items はイテレータでよい（_CHUNK 件ずつ溜めては書くので、JSON 全体をメモリに持たない）
+      - 次のチャンクの読み込みは別スレッドで先に進め、DB への書き込みと重ねる
+      - PG / SQLite は INSERT ... ON CONFLICT DO UPDATE 1 文（内容が同じ既存行は UPDATE しない）、
+        それ以外は既存判定（IN）+ INSERT / UPDATE の executemany
+      - 同じ publication_number が JSON 内で重複したら patents の内容は後勝ち（usecases は全部入れる）
+    """
+    # created_at / updated_at / ingested_at は DB 側（server_default / onupdate）で埋める
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    usecase_inserted = 0
+    total = 0
+
+    for rows, pending_usecases, n in _prefetch(_iter_chunks(items)):
+        total += n
+        ins, upd = _upsert_chunk(db, rows, pending_usecases)
+        inserted += ins
+        updated += upd
+        unchanged += len(rows) - ins - upd
+        usecase_inserted += len(pending_usecases)
 
     return {
         "patents_inserted": inserted,
         "patents_updated": updated,
+        "patents_unchanged": unchanged,
         "usecases_inserted": usecase_inserted,
-        "total_in_json": len(items),
+        "total_in_json": total,
     }
 
 
@@ -117,11 +297,10 @@ def upsert_patents(db: Session, items: List[Dict[str, Any]]) -> Dict[str, int]:
 # ------------------------
 def main():
     json_path = os.path.join(project_root(), "data", "patents.json")
-    items = read_json(json_path)
 
-    db = SessionLocal()
+    db = batch_session()
     try:
-        res = upsert_patents(db, items)
+        res = upsert_patents(db, iter_items(json_path))
         db.commit()
         print("[OK] patents.json imported")
         print(res)
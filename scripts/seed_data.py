@@ -4,9 +4,10 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 
+from sqlalchemy import inspect, select
 from sqlalchemy.orm import Session
 
-from app.db.session import SessionLocal
+from app.db.session import batch_session
 from app.db.models.transaction import Transaction, TransactionItem, UsageRequirement
 from app.db.models.patent import Patent, PatentUsecase
 from app.db.models.matrix import MatrixRule
@@ -15,17 +16,32 @@ CORE = "core"
 EXPANDED = "expanded"
 
 
+# モデルごとの mapped 属性名（列 + relationship）。hasattr で毎回 descriptor を引かずに済ませる
+_MAPPED_KEYS = {
+    cls: frozenset(inspect(cls).attrs.keys())
+    for cls in (Transaction, TransactionItem, UsageRequirement, Patent, PatentUsecase, MatrixRule)
+}
+
+
 def _safe_set(obj: Any, key: str, value: Any) -> None:
-    if hasattr(obj, key):
+    # ORM の属性イベント（変更検知・backref）が要るので setattr のまま
+    if key in _MAPPED_KEYS[type(obj)]:
         setattr(obj, key, value)
 
 
-def _get_or_create_transaction(db: Session, case_no: str, title: str, status: str) -> Transaction:
-    tx = db.query(Transaction).filter(Transaction.case_no == case_no).first()
+def _get_or_create_transaction(
+    db: Session,
+    existing_tx: Dict[str, Transaction],
+    case_no: str,
+    title: str,
+    status: str,
+) -> Transaction:
+    tx = existing_tx.get(case_no)
     if not tx:
+        # id は最後の flush でまとめて確定する（item / usage は relationship 経由で紐づける）
         tx = Transaction(case_no=case_no, title=title, status=status)
         db.add(tx)
-        db.flush()
+        existing_tx[case_no] = tx
     else:
         _safe_set(tx, "title", title)
         _safe_set(tx, "status", status)
@@ -33,29 +49,22 @@ def _get_or_create_transaction(db: Session, case_no: str, title: str, status: st
 
 
 def _get_or_create_item(
-    db: Session,
     tx: Transaction,
     item_name: str,
     item_model: str,
     spec_text: str,
     attachments_meta: Dict[str, Any],
 ) -> TransactionItem:
-    item = (
-        db.query(TransactionItem)
-        .filter(TransactionItem.transaction_id == tx.id,
-                TransactionItem.item_name == item_name)
-        .first()
-    )
+    # tx.items は selectin で読み込み済み（新規 tx なら空）なので SELECT しない
+    item = next((i for i in tx.items if i.item_name == item_name), None)
     if not item:
         item = TransactionItem(
-            transaction_id=tx.id,
             item_name=item_name,
             item_model=item_model,
             spec_text=spec_text,
             attachments_meta=attachments_meta,
         )
-        db.add(item)
-        db.flush()
+        tx.items.append(item)
     else:
         _safe_set(item, "item_model", item_model)
         _safe_set(item, "spec_text", spec_text)
@@ -63,7 +72,6 @@ def _get_or_create_item(
 
 
 def _ensure_usage(
-    db: Session,
     tx: Transaction,
     item: TransactionItem,
     source: str,
@@ -75,29 +83,20 @@ def _ensure_usage(
     if not text:
         return
 
-    exists = (
-        db.query(UsageRequirement)
-        .filter(
-            UsageRequirement.transaction_id == tx.id,
-            UsageRequirement.source == source,
-            UsageRequirement.text == text,
-        )
-        .first()
-    )
-    if exists:
+    # tx.usage_requirements も selectin で読み込み済み
+    if any(u.source == source and u.text == text for u in tx.usage_requirements):
         return
 
     u = UsageRequirement(
-        transaction_id=tx.id,
         source=source,
         text=text,
         risk_tags=risk_tags,
         created_by="user",
     )
-    _safe_set(u, "transaction_item_id", item.id)
+    _safe_set(u, "transaction_item", item)
     _safe_set(u, "confidence", confidence)
 
-    db.add(u)
+    tx.usage_requirements.append(u)
 
 
 def _get_or_create_patent(
@@ -167,66 +166,76 @@ def _ensure_rule(db: Session, regime: str, item_no: str, title: str, requirement
     )
 
 
+# 固定の seed データ（import 時に 1 回だけ組み立てる）
+SEED_TRANSACTIONS: List[Dict[str, Any]] = [
+    {
+        "case_no": "TX-0001",
+        "title": "Seed: Lithography material export review (KrF photoresist)",
+        "item": ("Photoresist (KrF)", "KR-PR-100"),
+        "spec": "KrF露光用フォトレジスト。微細加工用途。",
+        "usages": [
+            (CORE, "KrFエキシマレーザー露光を用いた半導体微細加工用レジスト材料として使用", ["semiconductor_mfg"], None),
+            (EXPANDED, "微細加工向けリソグラフィ工程で使用される感光性樹脂", ["semiconductor_mfg"], 0.72),
+        ],
+    },
+    {
+        "case_no": "TX-0002",
+        "title": "Seed: Semiconductor equipment export review (stage)",
+        "item": ("Lithography wafer stage", "STG-200"),
+        "spec": "半導体露光装置用ウェハステージ。",
+        "usages": [
+            (CORE, "半導体露光装置向けウェハ位置決め用の高精度ステージとして使用", ["semiconductor_equipment"], None),
+        ],
+    },
+    {
+        "case_no": "TX-0003",
+        "title": "Seed: Device export review (MCU)",
+        "item": ("Industrial MCU", "IMCU-40N"),
+        "spec": "産業制御用マイクロコントローラ。",
+        "usages": [
+            (CORE, "産業用途制御機器に搭載されるマイクロコントローラとして使用", ["device_control"], None),
+        ],
+    },
+    {
+        "case_no": "TX-0004",
+        "title": "Seed: Process chemical export review",
+        "item": ("Lithography developer", "DEV-88"),
+        "spec": "フォトリソ工程用現像液。",
+        "usages": [
+            (CORE, "フォトリソグラフィ工程の現像および洗浄用途に使用", ["process_chemical"], None),
+        ],
+    },
+    {
+        "case_no": "TX-0005",
+        "title": "Seed: Lithography material export review (ArF)",
+        "item": ("Photoresist (ArF)", "ARF-300"),
+        "spec": "ArF露光用フォトレジスト。",
+        "usages": [
+            (CORE, "ArFエキシマレーザー露光を用いた微細パターン形成用感光材料として使用", ["semiconductor_mfg"], None),
+        ],
+    },
+]
+_SEED_CASE_NOS = tuple(spec["case_no"] for spec in SEED_TRANSACTIONS)
+
+
 def upsert_min_seed(db: Session) -> None:
     base_time = datetime.utcnow() - timedelta(days=1)
 
-    tx_specs = [
-        {
-            "case_no": "TX-0001",
-            "title": "Seed: Lithography material export review (KrF photoresist)",
-            "item": ("Photoresist (KrF)", "KR-PR-100"),
-            "spec": "KrF露光用フォトレジスト。微細加工用途。",
-            "usages": [
-                (CORE, "KrFエキシマレーザー露光を用いた半導体微細加工用レジスト材料として使用", ["semiconductor_mfg"], None),
-                (EXPANDED, "微細加工向けリソグラフィ工程で使用される感光性樹脂", ["semiconductor_mfg"], 0.72),
-            ],
-        },
-        {
-            "case_no": "TX-0002",
-            "title": "Seed: Semiconductor equipment export review (stage)",
-            "item": ("Lithography wafer stage", "STG-200"),
-            "spec": "半導体露光装置用ウェハステージ。",
-            "usages": [
-                (CORE, "半導体露光装置向けウェハ位置決め用の高精度ステージとして使用", ["semiconductor_equipment"], None),
-            ],
-        },
-        {
-            "case_no": "TX-0003",
-            "title": "Seed: Device export review (MCU)",
-            "item": ("Industrial MCU", "IMCU-40N"),
-            "spec": "産業制御用マイクロコントローラ。",
-            "usages": [
-                (CORE, "産業用途制御機器に搭載されるマイクロコントローラとして使用", ["device_control"], None),
-            ],
-        },
-        {
-            "case_no": "TX-0004",
-            "title": "Seed: Process chemical export review",
-            "item": ("Lithography developer", "DEV-88"),
-            "spec": "フォトリソ工程用現像液。",
-            "usages": [
-                (CORE, "フォトリソグラフィ工程の現像および洗浄用途に使用", ["process_chemical"], None),
-            ],
-        },
-        {
-            "case_no": "TX-0005",
-            "title": "Seed: Lithography material export review (ArF)",
-            "item": ("Photoresist (ArF)", "ARF-300"),
-            "spec": "ArF露光用フォトレジスト。",
-            "usages": [
-                (CORE, "ArFエキシマレーザー露光を用いた微細パターン形成用感光材料として使用", ["semiconductor_mfg"], None),
-            ],
-        },
-    ]
-
-    for i, spec in enumerate(tx_specs):
-        tx = _get_or_create_transaction(db, spec["case_no"], spec["title"], "draft")
+    # 既存の取引を 1 クエリで引く（items / usage_requirements は selectin でそれぞれ 1 クエリずつ付いてくる）
+    existing_tx = {
+        tx.case_no: tx
+        for tx in db.scalars(
+            select(Transaction).where(Transaction.case_no.in_(_SEED_CASE_NOS))
+        )
+    }
+
+    for i, spec in enumerate(SEED_TRANSACTIONS):
+        tx = _get_or_create_transaction(db, existing_tx, spec["case_no"], spec["title"], "draft")
 
         _safe_set(tx, "created_at", base_time + timedelta(minutes=i))
         _safe_set(tx, "updated_at", base_time + timedelta(minutes=i))
 
         item = _get_or_create_item(
-            db,
             tx,
             spec["item"][0],
             spec["item"][1],
@@ -235,13 +244,13 @@ def upsert_min_seed(db: Session) -> None:
         )
 
         for src, text, tags, conf in spec["usages"]:
-            _ensure_usage(db, tx, item, src, text, tags, conf)
+            _ensure_usage(tx, item, src, text, tags, conf)
 
     db.flush()
 
 
 def main():
-    db = SessionLocal()
+    db = batch_session()
     try:
         upsert_min_seed(db)
         db.commit()